@@ -1,10 +1,8 @@
 import time
 import streamlit as st
-from pdf2image import convert_from_path
-import pytesseract
-from concurrent.futures import ThreadPoolExecutor, as_completed
-import os
 import base64
+from services.ocr_jobs import get_job_queue, QUEUED, RUNNING, DONE, FAILED
+from services.tesseract_batch import handoff_stats
 
 # --- CẤU HÌNH TRANG ---
 st.set_page_config(
@@ -95,35 +93,60 @@ with st.sidebar:
     st.write("""
 **Nghiên cứu nội dung tường thuật trên báo cáo thường niên và mối quan hệ tương quan giữa nội dung tường thuật với khả năng sinh lợi của các công ty niêm yết tại Việt Nam**
 """)
-
-# --- HÀM XỬ LÝ ---
-def pdf_to_images(pdf_path: str, dpi: int = 150):
-    return convert_from_path(pdf_path, dpi=dpi)
-
-def ocr_image(img) -> str:
-    return pytesseract.image_to_string(img, lang='vie+eng')
-
-def convert_images_to_text_parallel(images: list) -> str:
-    progress = st.progress(0)
-    total = len(images)
-    results = [''] * total
-    with ThreadPoolExecutor() as executor:
-        futures = {executor.submit(ocr_image, img): idx for idx, img in enumerate(images)}
-        completed = 0
-        for future in as_completed(futures):
-            idx = futures[future]
-            try:
-                results[idx] = future.result()
-            except:
-                results[idx] = ""
-            completed += 1
-            progress.progress(completed / total)
-    return "\n".join(results)
+    st.subheader("⚙️ Cấu hình OCR")
+    use_text_layer = st.checkbox("Lấy văn bản có sẵn trong PDF, chỉ OCR trang ảnh", value=True)
+    fast_mode = st.checkbox("⚡ Chế độ nhanh: OCR ở độ phân giải thấp, chỉ OCR lại trang có độ tin cậy thấp",
+                            value=False)
+
+# --- HÀNG ĐỢI XỬ LÝ ---
+# Hàng đợi dùng chung cho mọi phiên, giới hạn tổng số worker OCR (cấu hình qua biến môi trường OCR_*)
+job_queue = get_job_queue()
+with st.sidebar:
+    queue_counts = job_queue.counts()
+    st.caption(f"{job_queue.engine.backend} x{job_queue.engine.max_workers} worker, "
+               f"OMP_THREAD_LIMIT={job_queue.engine.omp_thread_limit}, "
+               f"{job_queue.engine.batch_size} trang/lần gọi tesseract · "
+               f"{queue_counts[RUNNING]} đang chạy, {queue_counts[QUEUED]} đang chờ")
+    if job_queue.engine.cache is not None:
+        cache_stats = job_queue.engine.cache.stats
+        st.caption(f"Bộ nhớ đệm OCR: {cache_stats['hits']} trang có sẵn, {cache_stats['misses']} trang mới "
+                   f"({cache_stats['size_bytes'] / 1024 / 1024:.1f} MB)")
+    tess_stats = handoff_stats()
+    st.caption(f"Truyền ảnh cho tesseract: {tess_stats['handoff']} · tránh ghi đĩa "
+               f"{tess_stats['bytes_avoided'] / 1024 / 1024:.1f} MB, đã ghi đĩa "
+               f"{tess_stats['bytes_written'] / 1024 / 1024:.1f} MB")
+
+# Số ký tự tối đa hiển thị trong khung xem trước, tệp tải xuống luôn chứa toàn bộ văn bản
+PREVIEW_CHARS = 50000
+
+def show_text_preview(text: str):
+    if len(text) > PREVIEW_CHARS:
+        text = text[:PREVIEW_CHARS] + "\n..."
+    st.text_area("📄 Văn bản đã trích xuất", value=text, height=400)
+
+def format_first_text(job) -> str:
+    if job.time_to_first_text is None:
+        return ""
+    return f", trang đầu tiên sau {job.time_to_first_text:.2f} giây"
+
+
+def format_page_classes(job) -> str:
+    page_classes = job.stats.get("page_classes")
+    if not page_classes:
+        return ""
+    return (f" Bỏ qua OCR: {page_classes['blank']} trang trống, {page_classes['picture']} trang hình ảnh; "
+            f"{page_classes['text']} trang chữ được OCR.")
+
+
+def format_fast_stats(job) -> str:
+    if not job.fast or not job.stats:
+        return ""
+    return (f" Chế độ nhanh: {job.stats['fast_pages']} trang đạt ở độ phân giải thấp, "
+            f"{job.stats['full_dpi_pages']} trang OCR lại ở độ phân giải đầy đủ.")
 
 # --- SESSION STATE ---
-if 'txt_path' not in st.session_state:
-    st.session_state.txt_path = None
-    st.session_state.elapsed = None
+if 'job_id' not in st.session_state:
+    st.session_state.job_id = None
 
 # --- KHU VỰC CHÍNH: INPUT CONTROLS + KẾT QUẢ ---
 st.title("📄 PDF to Text Converter")
@@ -132,35 +155,61 @@ st.write("Tải lên tệp PDF và nhấn nút để chuyển đổi sang text:"
 uploaded_file = st.file_uploader("Chọn tệp PDF", type="pdf")
 start_btn = st.button("▶️ Bắt đầu chuyển đổi")
 
-if start_btn and uploaded_file and st.session_state.txt_path is None:
-    pdf_path = "/tmp/uploaded_pdf.pdf"
-    with open(pdf_path, "wb") as f:
-        f.write(uploaded_file.read())
-    start_time = time.time()
-    with st.spinner("Đang xử lý PDF, vui lòng chờ..."):
-        images = pdf_to_images(pdf_path)
-        text = convert_images_to_text_parallel(images)
-    st.session_state.elapsed = time.time() - start_time
-
-    if text.strip():
-        txt_path = "/tmp/output_text.txt"
-        with open(txt_path, "w", encoding="utf-8") as f:
-            f.write(text)
-        st.session_state.txt_path = txt_path
-        st.success(f"✅ Hoàn tất trong {st.session_state.elapsed:.2f} giây.")
+if start_btn and uploaded_file and st.session_state.job_id is None:
+    st.session_state.job_id = job_queue.submit(uploaded_file.getvalue(), use_text_layer=use_text_layer,
+                                                 fast=fast_mode)
+
+job = job_queue.get(st.session_state.job_id) if st.session_state.job_id else None
+if job is None:
+    # Job đã bị dọn (quá hạn) hoặc chưa có job nào
+    st.session_state.job_id = None
+
+if job is not None and job.status in (QUEUED, RUNNING):
+    if job.status == QUEUED:
+        st.info(f"⏳ Đang chờ xử lý (vị trí {job_queue.queue_position(job.job_id)} trong hàng đợi)...")
+    else:
+        st.progress(min(job.completed_pages / max(job.total_pages, 1), 1.0))
+        st.write(f"Đang xử lý PDF: {job.completed_pages}/{job.total_pages} trang "
+                 f"({job.elapsed:.0f} giây{format_first_text(job)})")
+        partial_text = job.text_so_far()
+        if partial_text.strip():
+            st.download_button(
+                label="📥 Tải xuống phần đã xử lý",
+                data=partial_text.encode("utf-8"),
+                file_name="output_text_partial.txt",
+                mime="text/plain"
+            )
+            show_text_preview(partial_text)
+    # Không chặn script trong lúc OCR, chỉ kiểm tra lại trạng thái job sau mỗi giây
+    time.sleep(1)
+    st.rerun()
+
+if job is not None and job.status == FAILED:
+    st.error(f"❌ Lỗi khi xử lý PDF: {job.error} ({job.elapsed:.2f} giây).")
+
+if job is not None and job.status == DONE:
+    with open(job.output_path, "rb") as f:
+        data = f.read()
+    if data.strip():
+        st.success(f"✅ Hoàn tất trong {job.elapsed:.2f} giây ({job.pages_per_sec:.2f} trang/giây"
+                   f"{format_first_text(job)}).{format_page_classes(job)}{format_fast_stats(job)}")
     else:
-        st.error(f"❌ Không trích xuất được văn bản ({st.session_state.elapsed:.2f} giây).")
+        st.error(f"❌ Không trích xuất được văn bản ({job.elapsed:.2f} giây).")
 
-if st.session_state.txt_path:
+if job is not None and job.status in (DONE, FAILED):
     col1, col2 = st.columns(2)
     with col1:
-        st.download_button(
-            label="📥 Tải xuống tệp văn bản",
-            data=open(st.session_state.txt_path, "rb").read(),
-            file_name="output_text.txt",
-            mime="text/plain"
-        )
+        if job.status == DONE and data.strip():
+            st.download_button(
+                label="📥 Tải xuống tệp văn bản",
+                data=data,
+                file_name="output_text.txt",
+                mime="text/plain"
+            )
     with col2:
         if st.button("🔄 Chuyển file khác"):
-            st.session_state.txt_path = None
+            job_queue.discard(job.job_id)
+            st.session_state.job_id = None
             st.rerun()
+    if job.status == DONE and data.strip():
+        show_text_preview(data.decode("utf-8"))
@@ -1,20 +1,107 @@
+import os
+import time
 import cv2
 import numpy as np
 from array import array
 import pytesseract
 from fitz import Page
 from operator import itemgetter
+from services.tesseract_batch import image_to_string_batch
 from util.util import compare_rect
 
 
+class RectGrid:
+    """ Uniform grid over (x, y, w, h) rects that returns the rects intersecting a query rect.
+
+    A rect is stored in every `cell_size` square it covers, so a query only looks at the
+    rects of the squares around it instead of every stored rect.
+    """
+
+    def __init__(self, cell_size: int = 128) -> None:
+        self.cell_size = cell_size
+        self.cells = {}
+        self.rects = []
+
+    def _cells(self, rect: tuple, margin: int = 0):
+        x, y, w, h = rect
+        for cx in range((x - margin) // self.cell_size, (x + w + margin) // self.cell_size + 1):
+            for cy in range((y - margin) // self.cell_size, (y + h + margin) // self.cell_size + 1):
+                yield cx, cy
+
+    def add(self, rect: tuple) -> None:
+        idx = len(self.rects)
+        self.rects.append(rect)
+        for cell in self._cells(rect):
+            self.cells.setdefault(cell, []).append(idx)
+
+    def query(self, rect: tuple, margin: int = 0) -> list:
+        """ Stored rects whose closed box intersects `rect` grown by `margin` pixels, in insertion order. """
+        x, y, w, h = rect
+        found = set()
+        for cell in self._cells(rect, margin):
+            found.update(self.cells.get(cell, ()))
+        result = []
+        for idx in sorted(found):
+            ox, oy, ow, oh = self.rects[idx]
+            if ox <= x + w + margin and x - margin <= ox + ow and oy <= y + h + margin and y - margin <= oy + oh:
+                result.append(self.rects[idx])
+        return result
+
+
 class Image_PDF:
     """ 
     The object to find all tables in image of file PDF.
+
+    Candidate tables and cells are kept only if their crop contains text. With
+    `emptiness_check="pixels"` this is decided from the connected components of the
+    binarized crop (table lines removed), and only borderline crops are sent to
+    Tesseract; `emptiness_check="tesseract"` OCRs every crop; `emptiness_check="none"`
+    keeps every crop, for callers that read the text some other way (e.g. from the PDF
+    text layer). `stats` counts the decisions and the time spent on them.
+
+    With `table_detection="pyramid"`, `extract_tables` finds the table lines on a copy
+    of the page downscaled 2-4x, with kernels sized relative to the page, takes the table
+    boxes from one `connectedComponentsWithStats` call and works at full resolution
+    only inside those boxes to refine them. `"full"` runs the original full-page pipeline.
     """
 
-    def __init__(self) -> None:
-        pytesseract.pytesseract.tesseract_cmd = r"C:\Program Files\Tesseract-OCR\tesseract.exe"
-        pass
+    EMPTINESS_CHECKS = ("pixels", "tesseract", "none")
+    TABLE_DETECTIONS = ("full", "pyramid")
+    # Thành phần liên thông nhỏ hơn MIN_COMPONENT_AREA điểm ảnh là nhiễu
+    MIN_COMPONENT_AREA = 4
+    # Từ số thành phần này trở lên ô chắc chắn có chữ, 0 thành phần là ô trống, ở giữa hỏi Tesseract
+    TEXT_MIN_COMPONENTS = 3
+
+    # Khoảng cách (px) tối đa giữa hai hình chữ nhật mà compare_rect (util.util) có thể coi là trùng.
+    # compare_rect là phép kiểm tra chứa/chồng lấn nên chỉ cần so các hình giao nhau (0).
+    # None: so với mọi hình đã nhận (vòng lặp bậc hai ban đầu)
+    RECT_MATCH_MARGIN = 0
+
+    # Chế độ pyramid: cạnh dài của ảnh thu nhỏ khoảng PYRAMID_TARGET_SIZE px, hệ số thu nhỏ trong PYRAMID_SCALES
+    PYRAMID_TARGET_SIZE = 900
+    PYRAMID_SCALES = (2, 4)
+    # Đường kẻ dài ít nhất LINE_MIN_LENGTH_RATIO chiều tương ứng của trang (dài hơn nét chữ thường)
+    LINE_MIN_LENGTH_RATIO = 0.02
+    # Bảng rộng và cao ít nhất TABLE_MIN_SIZE_RATIO chiều tương ứng của trang (loại đường kẻ đơn lẻ)
+    TABLE_MIN_SIZE_RATIO = 0.01
+
+    # Đường dẫn Tesseract mặc định trên Windows, chỉ dùng khi file này tồn tại
+    WINDOWS_TESSERACT_CMD = r"C:\Program Files\Tesseract-OCR\tesseract.exe"
+
+    def __init__(self, emptiness_check: str = "pixels", table_detection: str = "full") -> None:
+        # tesseract_cmd là biến toàn cục của pytesseract (tesseract_batch cũng dùng), không ghi đè bằng đường dẫn không có
+        if os.path.isfile(self.WINDOWS_TESSERACT_CMD):
+            pytesseract.pytesseract.tesseract_cmd = self.WINDOWS_TESSERACT_CMD
+        if emptiness_check not in self.EMPTINESS_CHECKS:
+            raise ValueError(f"Unknown emptiness check '{emptiness_check}', expected one of {self.EMPTINESS_CHECKS}")
+        if table_detection not in self.TABLE_DETECTIONS:
+            raise ValueError(f"Unknown table detection '{table_detection}', expected one of {self.TABLE_DETECTIONS}")
+        self.emptiness_check = emptiness_check
+        self.table_detection = table_detection
+        self.reset_stats()
+
+    def reset_stats(self) -> None:
+        self.stats = {"crops": 0, "empty": 0, "text": 0, "tesseract": 0, "seconds": 0.0}
 
     def extract_tables(self, image_pdf: np.ndarray) -> list:
         """ To find all table in PDF
@@ -30,6 +117,8 @@ class Image_PDF:
             - `position_tables`: This list stores all position (x,y,w,h) of tables.
             - `image_tables`: This list stores all image of tables.
         """
+        if self.table_detection == "pyramid":
+            return self.extract_tables_pyramid(image_pdf)
         in_image = image_pdf
         ##### Convert gray image into binary image (Always)
         MAX_COLOR_VAL = 255
@@ -91,12 +180,68 @@ class Image_PDF:
 
         position_tables = []
         image_tables = []
-        for table in pos_table:
-            x, y, w, h = table
-            image = in_image[max(y-10, 0) :y+h+5, max(x-10,0) :x+w+5]
-            if pytesseract.image_to_string(image=image) != "":
-                position_tables.append(table)
-                image_tables.append(image)
+        text_mask = self.text_mask(img_bin, vertical_horizontal_lines)
+        for table, image in self.filter_non_empty(pos_table, in_image, text_mask):
+            position_tables.append(table)
+            image_tables.append(image)
+
+        return [position_tables, image_tables]
+
+    @staticmethod
+    def binarize(image: np.ndarray) -> np.ndarray:
+        """ Binary image (dark pixels white) with the adaptive threshold of `extract_tables`. """
+        return cv2.adaptiveThreshold(~image, 255, cv2.ADAPTIVE_THRESH_MEAN_C, cv2.THRESH_BINARY, 7, -20)
+
+    def line_mask(self, img_bin: np.ndarray, page_shape: tuple, scale: int = 1) -> np.ndarray:
+        """ Horizontal and vertical lines of `img_bin`, at least LINE_MIN_LENGTH_RATIO of the page long. """
+        page_height, page_width = page_shape
+        horizontal_length = max(3, round(self.LINE_MIN_LENGTH_RATIO * page_width / scale))
+        vertical_length = max(3, round(self.LINE_MIN_LENGTH_RATIO * page_height / scale))
+        horizontal_lines = cv2.morphologyEx(img_bin, cv2.MORPH_OPEN, np.ones((1, horizontal_length), np.uint8))
+        vertical_lines = cv2.morphologyEx(img_bin, cv2.MORPH_OPEN, np.ones((vertical_length, 1), np.uint8))
+        return cv2.bitwise_or(horizontal_lines, vertical_lines)
+
+    def extract_tables_pyramid(self, image_pdf: np.ndarray) -> list:
+        """ `extract_tables` on a downscaled copy of the page, refined at full resolution (see the class docstring). """
+        image_height, image_width = image_pdf.shape
+        assert image_width > 120 , "Input image is not a image of file PDF."
+
+        ##### Downscale keeping the darkest pixel of each block, so 1 px lines are not lost
+        scale = min(max(round(max(image_pdf.shape) / self.PYRAMID_TARGET_SIZE), self.PYRAMID_SCALES[0]),
+                    self.PYRAMID_SCALES[1])
+        small_height, small_width = image_height // scale, image_width // scale
+        ##### erode lấy min trên khối scale x scale bắt đầu tại (i * scale, j * scale) khi neo ở scale // 2
+        small = cv2.erode(image_pdf, np.ones((scale, scale), np.uint8))[
+            scale // 2::scale, scale // 2::scale][:small_height, :small_width]
+
+        ##### Table boxes = connected components of the line mask
+        join = max(2, round(0.003 * max(small.shape)))
+        lines = cv2.dilate(self.line_mask(self.binarize(small), image_pdf.shape, scale), np.ones((join, join), np.uint8))
+        n_labels, _, components, _ = cv2.connectedComponentsWithStats(lines, connectivity=8)
+        boxes = components[1:, :4]
+        boxes = boxes[(boxes[:, 2] >= self.TABLE_MIN_SIZE_RATIO * small_width)
+                      & (boxes[:, 3] >= self.TABLE_MIN_SIZE_RATIO * small_height)]
+
+        ##### Refine each box at full resolution, inside the box only
+        text_mask = np.zeros_like(image_pdf)
+        pos_table = []
+        for x, y, w, h in boxes:
+            x0, y0 = max(0, (x - join) * scale), max(0, (y - join) * scale)
+            x1, y1 = min(image_width, (x + w + join) * scale), min(image_height, (y + h + join) * scale)
+            img_bin = self.binarize(image_pdf[y0:y1, x0:x1])
+            crop_lines = self.line_mask(img_bin, image_pdf.shape)
+            if not crop_lines.any():
+                continue
+            rx, ry, rw, rh = cv2.boundingRect(crop_lines)
+            pos_table.append((int(x0 + rx), int(y0 + ry), int(rw), int(rh)))
+            np.maximum(text_mask[y0:y1, x0:x1], self.text_mask(img_bin, crop_lines), out=text_mask[y0:y1, x0:x1])
+        pos_table.sort(key=itemgetter(1, 0))
+
+        position_tables = []
+        image_tables = []
+        for table, image in self.filter_non_empty(pos_table, image_pdf, text_mask):
+            position_tables.append(table)
+            image_tables.append(image)
 
         return [position_tables, image_tables]
 
@@ -181,15 +326,54 @@ class Image_PDF:
 
         image_cells = []
         position_cells = []
-        for cell in pos_cells:
-            x, y, w, h = cell
-            image = table_img[max(y-10, 0) :y+h+5, max(x-10,0) :x+w+5]
-            if pytesseract.image_to_string(image= image) != "":
+        ##### Lines are black on white here
+        text_mask = self.text_mask(img_bin, ~vertical_horizontal_lines)
+        for cell, image in self.filter_non_empty(pos_cells, table_img, text_mask):
                     position_cells.append(cell)
                     image_cells.append(image)
 
         return [var_bol, position_cells, image_cells]
 
+    @staticmethod
+    def text_mask(img_bin: np.ndarray, lines: np.ndarray) -> np.ndarray:
+        """ Foreground pixels of the binary image `img_bin` that are not on the table lines (white in `lines`). """
+        lines = cv2.dilate(lines, np.ones((3, 3), np.uint8))
+        return cv2.bitwise_and(img_bin, cv2.bitwise_not(lines))
+
+    def crop_has_text(self, mask_crop: np.ndarray):
+        """ True / False from the connected components of a text-mask crop, None when borderline. """
+        n_labels, _, stats, _ = cv2.connectedComponentsWithStats(mask_crop, connectivity=8)
+        n_components = int(np.count_nonzero(stats[1:, cv2.CC_STAT_AREA] >= self.MIN_COMPONENT_AREA))
+        if n_components == 0:
+            return False
+        if n_components >= self.TEXT_MIN_COMPONENTS:
+            return True
+        return None
+
+    def filter_non_empty(self, rects: list, image: np.ndarray, text_mask: np.ndarray) -> list:
+        """ Keep the (rect, crop) pairs whose crop contains text, in the order of `rects`. """
+        start_time = time.perf_counter()
+        crops = [(max(y-10, 0), y+h+5, max(x-10, 0), x+w+5) for x, y, w, h in rects]
+        images = [image[y0:y1, x0:x1] for y0, y1, x0, x1 in crops]
+        if self.emptiness_check == "tesseract":
+            verdicts = [None] * len(images)
+        elif self.emptiness_check == "none":
+            verdicts = [True] * len(images)
+        else:
+            verdicts = [self.crop_has_text(text_mask[y0:y1, x0:x1]) for y0, y1, x0, x1 in crops]
+
+        ##### Check the borderline crops in one tesseract run
+        borderline = [idx for idx, verdict in enumerate(verdicts) if verdict is None]
+        for idx, text in zip(borderline, image_to_string_batch([images[idx] for idx in borderline])):
+            verdicts[idx] = text.strip() != ""
+
+        self.stats["crops"] += len(images)
+        self.stats["tesseract"] += len(borderline)
+        self.stats["text"] += sum(1 for verdict in verdicts if verdict)
+        self.stats["empty"] += sum(1 for verdict in verdicts if not verdict)
+        self.stats["seconds"] += time.perf_counter() - start_time
+        return [(rect, crop) for rect, crop, verdict in zip(rects, images, verdicts) if verdict]
+
     def convert_position_img2pdf(self, pos_img: list, page: Page, image: array) -> list:
         """ To convert position of table in Image to PDF.
 
@@ -245,18 +429,37 @@ class Image_PDF:
         List table is sorted
         """
         sorted_list = sorted(list_rects, key=itemgetter(1, 0))
-        list_tables = []
-        for rect in sorted_list:
-            bool_table = False
-            if list_tables:
-                for pre_rect in list_tables:
-                    if compare_rect(rect, pre_rect):
-                        bool_table = True
-            if bool_table == False:
-                if rect[2] > 20 and rect[3] > 20 and rect[0] != 0 and rect[1] != 0:
-                    list_tables.append(rect)
+        keep = Image_PDF._size_mask(sorted_list)
+        list_tables = Image_PDF._unique_rects(sorted_list, keep)
         return sorted(list_tables, key=itemgetter(1, 0))
 
+    @staticmethod
+    def _size_mask(sorted_list: list) -> np.ndarray:
+        """ rect[2] > 20 and rect[3] > 20 and rect[0] != 0 and rect[1] != 0, for all rects at once. """
+        rects = np.array(sorted_list, dtype=np.int64).reshape(-1, 4)
+        return (rects[:, 2] > 20) & (rects[:, 3] > 20) & (rects[:, 0] != 0) & (rects[:, 1] != 0)
+
+    @staticmethod
+    def _unique_rects(sorted_list: list, keep: np.ndarray) -> list:
+        """ Accept, in order, the rects allowed by `keep` that `compare_rect` does not match to an accepted rect.
+
+        `compare_rect(rect, pre_rect)` (containment/overlap) can only be true for rects at
+        most RECT_MATCH_MARGIN pixels apart, so only the accepted rects found near `rect` by
+        a RectGrid are compared. RECT_MATCH_MARGIN = None compares every accepted rect.
+        """
+        margin = Image_PDF.RECT_MATCH_MARGIN
+        grid = RectGrid()
+        accepted = []
+        for rect, size_ok in zip(sorted_list, keep):
+            if not size_ok:
+                continue
+            candidates = accepted if margin is None else grid.query(rect, margin)
+            if any(compare_rect(rect, pre_rect) for pre_rect in candidates):
+                continue
+            grid.add(rect)
+            accepted.append(rect)
+        return accepted
+
     @staticmethod
     def find_rect_cells(list_rects: list, S_table: int) -> list:
         """Function using to find all cells in bounding rect or filter all table.
@@ -277,19 +480,10 @@ class Image_PDF:
             - `list_cells`: A list cell is sorted.
         """
         sorted_list = sorted(list_rects, key=itemgetter(1, 0))
-        list_cells = []
-        for rect in sorted_list:
-            bool_cell = False
-            if list_cells:
-                for pre_rect in list_cells:
-                    if compare_rect(rect, pre_rect):
-                        bool_cell = True
-            if bool_cell == False:
-                S_cell = rect[3] * rect[2]
-                if rect[2] > 20 and rect[3] > 20 and rect[0] != 0 and rect[1] != 0 and S_cell < 0.9 * S_table:
-                    list_cells.append(rect)
-        S_total_cell = 0
-        for cell in list_cells:
-            S_total_cell += cell[2] * cell[3]
+        rects = np.array(sorted_list, dtype=np.int64).reshape(-1, 4)
+        keep = Image_PDF._size_mask(sorted_list) & (rects[:, 2] * rects[:, 3] < 0.9 * S_table)
+        list_cells = Image_PDF._unique_rects(sorted_list, keep)
+        cells = np.array(list_cells, dtype=np.int64).reshape(-1, 4)
+        S_total_cell = int(np.sum(cells[:, 2] * cells[:, 3]))
 
         return [[S_total_cell / S_table > 0.775, S_total_cell / S_table], sorted(list_cells, key=itemgetter(1, 0))]
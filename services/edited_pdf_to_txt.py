@@ -1,170 +1,527 @@
 import os
+import json
+import hashlib
+import math
+import random
+import time
 import pandas as pd
-from PyPDF2 import PdfReader
-from pdfminer.high_level import extract_text
-from pdf2image import convert_from_path
+from concurrent.futures import ProcessPoolExecutor, as_completed
 import shutil
 import fitz  # PyMuPDF
-import re
-from PIL import Image
-import pytesseract
+import string
+from services.pdf_converter import MIN_TEXT_LAYER_CHARS
+
+# Nhãn của từng trang khi phân loại bằng fitz
+TEXT_LAYER_PAGE, SCANNED_PAGE, MIXED_PAGE = "text", "scanned", "mixed"
+# Trang có ảnh phủ từ tỉ lệ diện tích này trở lên được coi là trang quét
+SCANNED_MIN_IMAGE_COVERAGE = 0.5
+# Lớp văn bản của trang có ảnh lớn là lớp OCR khi phần lớn ký tự ẩn
+# (render mode 3, như Tesseract/OCRmyPDF ghi)
+OCR_OVERLAY_MIN_INVISIBLE_SHARE = 0.5
+# Khi mọi trang đã xét là trang quét, dừng lấy mẫu nếu khoảng tin cậy (Wilson, 95%) cho thấy
+# tỉ lệ trang không phải trang quét hẳn dưới 1 - SCANNED_SHARE_HIGH. Tài liệu văn bản không dừng
+# sớm vì vài trang quét bị bỏ sót sẽ không bao giờ được OCR; đã gặp trang khác nhãn thì tài liệu
+# là hỗn hợp
+SCANNED_SHARE_HIGH = 0.9
+CONFIDENCE_Z = 1.96
+
+def sample_order(n_pages, seed=0):
+    """
+    Page indices in a fixed pseudo-random order, so that any prefix is a uniform sample
+    of the document (a regular stride would alias with alternating page layouts).
+    """
+    order = list(range(n_pages))
+    random.Random(seed).shuffle(order)
+    return order
+
+
+def wilson_interval(successes, n, z=CONFIDENCE_Z):
+    if n == 0:
+        return 0.0, 1.0
+    share = successes / n
+    center = (share + z * z / (2 * n)) / (1 + z * z / n)
+    margin = z * math.sqrt(share * (1 - share) / n + z * z / (4 * n * n)) / (1 + z * z / n)
+    return center - margin, center + margin
+
+
+def document_label(page_labels):
+    """
+    Label of a document from the labels of its pages: "text" or "scanned" when every page
+    has that label, "mixed" otherwise (also used by `classify_pdf`).
+    """
+    if page_labels and all(label == TEXT_LAYER_PAGE for label in page_labels):
+        return TEXT_LAYER_PAGE
+    if page_labels and all(label == SCANNED_PAGE for label in page_labels):
+        return SCANNED_PAGE
+    return MIXED_PAGE
+
+
+def inspect_pdf_pages(pdf_path):
+    """
+    Decide whether a PDF is a text, scanned or mixed document.
+
+    Pages are labelled with `classify_pdf_page` in `sample_order`. While every page seen
+    is scanned, sampling stops as soon as the confidence interval of the share of other
+    pages is clearly below 1 - SCANNED_SHARE_HIGH: the document is OCRed anyway, so a
+    missed text page costs nothing. Otherwise every page is checked (no rendering, so
+    this is cheap), because a "text" verdict means the document is never OCRed;
+    `page_verdicts` ({page number (1-based): label}) then covers every page and the
+    verdict is the same as `classify_pdf`.
+    """
+    start_time = time.perf_counter()
+    page_verdicts = {}
+    scanned = 0
+    verdict = None
+    with fitz.open(pdf_path) as pdf_document:
+        n_pages = len(pdf_document)
+        for idx in sample_order(n_pages):
+            label = classify_pdf_page(pdf_document[idx])["label"]
+            page_verdicts[idx + 1] = label
+            scanned += label == SCANNED_PAGE
+            if scanned < len(page_verdicts) or len(page_verdicts) == n_pages:
+                continue
+            # Cận trên của tỉ lệ trang không phải trang quét khi chưa gặp trang nào như vậy
+            _, high = wilson_interval(0, len(page_verdicts))
+            if high < 1 - SCANNED_SHARE_HIGH:
+                verdict = SCANNED_PAGE
+                break
+
+    if verdict is None:
+        verdict = document_label(list(page_verdicts.values()))
+    return {
+        "verdict": verdict,
+        "total_pages": n_pages,
+        "pages_checked": len(page_verdicts),
+        "scanned_share": scanned / len(page_verdicts) if page_verdicts else 0.0,
+        "page_verdicts": dict(sorted(page_verdicts.items())),
+        "seconds": time.perf_counter() - start_time
+    }
+
 
 def is_scanned_pdf(pdf_path):
+    # Tài liệu hỗn hợp cũng cần OCR cho một phần các trang nên được xếp cùng tài liệu quét
     try:
-        # Open the PDF file
-        pdf_document = fitz.open(pdf_path)
-        
-        # Check if text is selectable on each page
-        for page in pdf_document:
-            text = page.get_text()
-            if len(text.strip()) == 0:
-                # If no selectable text found, it's likely a scanned PDF
-                return True
-        
-        return False
+        return inspect_pdf_pages(pdf_path)["verdict"] != TEXT_LAYER_PAGE
     except Exception as e:
         print(f"Error processing {pdf_path}: {e}")
         return None
 
-def classify_pdfs(source_folder, scanned_folder, edited_folder, error_folder):
+
+def _inspect_pdf_file(pdf_path):
+    try:
+        return inspect_pdf_pages(pdf_path)
+    except Exception as e:
+        return {"verdict": None, "error": str(e)}
+
+
+def classify_pdfs(source_folder, scanned_folder, edited_folder, error_folder, workers=None, manifest_path=None):
+    """
+    Move the PDFs of `source_folder` into scanned/edited/error folders, inspecting files in parallel.
+
+    Scanned and mixed documents go to `scanned_folder`. Returns one result per file
+    (see `inspect_pdf_pages`) and, with `manifest_path`, writes them as JSON lines so the
+    per-page verdicts of mixed documents are kept after the move.
+    """
     # Create destination folders if they don't exist
     os.makedirs(scanned_folder, exist_ok=True)
     os.makedirs(edited_folder, exist_ok=True)
     os.makedirs(error_folder, exist_ok=True)
-    
-    # Iterate over all files in the source folder
-    for filename in os.listdir(source_folder):
-        if filename.lower().endswith('.pdf'):
+
+    filenames = [filename for filename in os.listdir(source_folder) if filename.lower().endswith('.pdf')]
+    results = []
+    start_time = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = {executor.submit(_inspect_pdf_file, os.path.join(source_folder, filename)): filename
+                   for filename in filenames}
+        for future in as_completed(futures):
+            filename = futures[future]
+            result = dict(future.result(), file_name=filename)
+            results.append(result)
             pdf_path = os.path.join(source_folder, filename)
-            is_scanned = is_scanned_pdf(pdf_path)
-            if is_scanned is None:
+            if result["verdict"] is None:
                 # Move the file to the error folder if there was an error processing it
+                print(f"Error processing {pdf_path}: {result['error']}")
                 shutil.move(pdf_path, os.path.join(error_folder, filename))
-                continue
-            if is_scanned:
-                shutil.move(pdf_path, os.path.join(scanned_folder, filename))
-            else:
+            elif result["verdict"] == TEXT_LAYER_PAGE:
                 shutil.move(pdf_path, os.path.join(edited_folder, filename))
+            else:
+                shutil.move(pdf_path, os.path.join(scanned_folder, filename))
+
+    if manifest_path is not None:
+        with open(manifest_path, "w", encoding="utf-8") as f:
+            for result in results:
+                f.write(json.dumps(result, ensure_ascii=False) + "\n")
+
+    elapsed = time.perf_counter() - start_time
+    timings = [result["seconds"] for result in results if "seconds" in result]
+    verdicts = [result["verdict"] for result in results]
+    print(f"Classified {len(results)} PDFs in {elapsed:.1f}s: {verdicts.count(TEXT_LAYER_PAGE)} text, "
+          f"{verdicts.count(SCANNED_PAGE)} scanned, {verdicts.count(MIXED_PAGE)} mixed, {verdicts.count(None)} errors")
+    if timings:
+        print(f"Time per file: mean {sum(timings) / len(timings):.3f}s, max {max(timings):.3f}s; "
+              f"pages checked: {sum(r['pages_checked'] for r in results if 'pages_checked' in r)}"
+              f"/{sum(r['total_pages'] for r in results if 'total_pages' in r)}")
+    return results
+
+def classify_pdf_page(page) -> dict:
+    """
+    Label one fitz page from its text layer, fonts and image coverage.
+
+    - "scanned": no usable text layer (fewer than MIN_TEXT_LAYER_CHARS characters or
+      no font) and at least one image.
+    - "mixed": a scan with an OCR text layer: images covering at least
+      SCANNED_MIN_IMAGE_COVERAGE of the page and at least OCR_OVERLAY_MIN_INVISIBLE_SHARE
+      of the characters invisible.
+    - "text": everything else, including blank pages and text pages with a large
+      picture (e.g. a photo cover with a visible title).
+    """
+    text_chars = len("".join(page.get_text().split()))
+    has_fonts = bool(page.get_fonts())
+    page_rect = page.rect
+    page_area = page_rect.width * page_rect.height or 1
+    image_area = 0.0
+    for image in page.get_image_info():
+        bbox = fitz.Rect(image["bbox"]) & page_rect
+        if not bbox.is_empty:
+            image_area += bbox.width * bbox.height
+    image_coverage = min(image_area / page_area, 1.0)
+    has_text_layer = text_chars >= MIN_TEXT_LAYER_CHARS and has_fonts
+    invisible_share = 0.0
+    if has_text_layer and image_coverage >= SCANNED_MIN_IMAGE_COVERAGE:
+        # Chỉ đọc texttrace khi cần: trang văn bản thường không có ảnh lớn
+        spans = page.get_texttrace()
+        n_chars = sum(len(span["chars"]) for span in spans)
+        invisible_chars = sum(len(span["chars"]) for span in spans if span["type"] == 3 or span["opacity"] == 0)
+        invisible_share = invisible_chars / n_chars if n_chars else 0.0
+
+    if not has_text_layer and image_area > 0:
+        label = SCANNED_PAGE
+    elif (has_text_layer and image_coverage >= SCANNED_MIN_IMAGE_COVERAGE
+          and invisible_share >= OCR_OVERLAY_MIN_INVISIBLE_SHARE):
+        label = MIXED_PAGE
+    else:
+        label = TEXT_LAYER_PAGE
+    return {"label": label, "text_chars": text_chars, "image_coverage": image_coverage, "has_fonts": has_fonts,
+            "invisible_share": invisible_share}
 
-def is_scanned_page(image):
-    text = pytesseract.image_to_string(image)
-    return len(text.strip()) > 0
 
 def classify_pdf(pdf_path):
-    pdf_reader = PdfReader(open(pdf_path, 'rb'))
-    total_pages = len(pdf_reader.pages)
-    
-    edited_text_pages = 0
-    scanned_pages = 0
-    
-    # Check for edited text
-    edited_text = extract_text(pdf_path)
-    if edited_text.strip():
-        edited_text_pages = len(edited_text.strip().split('\n\n'))
-    
-    # Check for scanned images
-    images = convert_from_path(pdf_path)
-    for image in images:
-        if is_scanned_page(image):
-            scanned_pages += 1
+    """
+    Classify every page of a PDF in one fitz pass (no rendering, no OCR).
+
+    The document label is "text" or "scanned" when all pages have that label and
+    "mixed" otherwise. `page_labels` holds one letter per page (t/s/m).
+    """
+    with fitz.open(pdf_path) as pdf_document:
+        pages = [classify_pdf_page(page) for page in pdf_document]
 
+    labels = [page["label"] for page in pages]
     return {
-        "total_pages": total_pages,
-        "edited_text_pages": edited_text_pages,
-        "scanned_pages": scanned_pages
+        "total_pages": len(labels),
+        "edited_text_pages": labels.count(TEXT_LAYER_PAGE),
+        "scanned_pages": labels.count(SCANNED_PAGE),
+        "mixed_pages": labels.count(MIXED_PAGE),
+        "label": document_label(labels),
+        "page_labels": "".join(page_label[0] for page_label in labels)
     }
 
-def classify_pdfs_in_folder(folder_path):
-    data = []
-    for file_name in os.listdir(folder_path):
-        if file_name.endswith('.pdf'):
-            file_path = os.path.join(folder_path, file_name)
-            classification = classify_pdf(file_path)
-            classification['file_name'] = file_name
-            data.append(classification)
-    
+
+def _classify_pdf_row(file_path):
+    row = {'file_name': os.path.basename(file_path)}
+    try:
+        row.update(classify_pdf(file_path))
+    except Exception as e:
+        row.update(label="error", error=str(e))
+    return row
+
+
+def classify_pdfs_in_folder(folder_path, manifest_path=None, workers=None):
+    """
+    Classify all PDFs of a folder in parallel and return one row per file.
+
+    Files that cannot be opened get the label "error". When `manifest_path` is given
+    the table is also written there as CSV.
+    """
+    file_paths = sorted(os.path.join(folder_path, file_name) for file_name in os.listdir(folder_path)
+                        if file_name.endswith('.pdf'))
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        data = list(executor.map(_classify_pdf_row, file_paths))
+
     df = pd.DataFrame(data)
+    if manifest_path is not None:
+        df.to_csv(manifest_path, index=False, encoding="utf-8")
     return df
 
-def extract_text(pdf_path):
-    # Open the PDF file
-    pdf_document = fitz.open(pdf_path)
+def _table_detector():
+    # Import khi cần: tìm bảng dùng OpenCV, trích xuất văn bản thông thường thì không
+    from services.TableDetectionService import Image_PDF
+    return Image_PDF(emptiness_check="none")
 
-    # Initialize an empty string to store text
-    text = ""
 
-    # Iterate through each page of the PDF
-    for page_num in range(len(pdf_document)):
-        # Get the page
-        page = pdf_document.load_page(page_num)
+def _count_chars(text):
+    return len("".join(text.split()))
 
-        # Extract text from the page
-        page_text = page.get_text()
 
-        # Append the modified page text to the overall text
-        text += page_text
+def page_text(page, table_detector=None, stats=None):
+    """
+    Text layer of a fitz page. With a `table_detector` (`Image_PDF`), the words whose
+    centre lies inside a table found on the page are left out and the remaining words
+    are joined line by line; pages without tables keep `page.get_text()` unchanged.
 
-    # Close the PDF document
-    pdf_document.close()
+    `stats`, if given, accumulates `chars` (non-whitespace characters of the text
+    layer), `table_chars` (of those, the ones left out), `tables` and `table_pages`.
+    """
+    text = page.get_text()
+    if table_detector is None:
+        return text
+    from services.pdf_tables import detect_tables
 
-    return text
+    table_boxes = [table_box for table_box, _ in detect_tables(page, table_detector)]
+    kept_text = text
+    if table_boxes:
+        lines = {}
+        for x0, y0, x1, y1, word, block_no, line_no, _ in page.get_text("words"):
+            x, y = (x0 + x1) / 2, (y0 + y1) / 2
+            if not any(bx0 <= x <= bx1 and by0 <= y <= by1 for bx0, by0, bx1, by1 in table_boxes):
+                lines.setdefault((block_no, line_no), []).append(word)
+        kept_text = "".join(" ".join(words) + "\n" for words in lines.values())
+    if stats is not None:
+        chars = _count_chars(text)
+        stats["chars"] = stats.get("chars", 0) + chars
+        stats["table_chars"] = stats.get("table_chars", 0) + chars - _count_chars(kept_text)
+        stats["tables"] = stats.get("tables", 0) + len(table_boxes)
+        stats["table_pages"] = stats.get("table_pages", 0) + bool(table_boxes)
+    return kept_text
 
 
-def convert_pdfs_in_folder(source_folder_path, destination_folder_path):
+def extract_text(pdf_path, exclude_tables=False, stats=None):
+    """Text layer of a PDF; with `exclude_tables`, without the text of its tables (see `page_text`)."""
+    # Gom text từng trang vào list rồi nối một lần, không cộng dồn chuỗi
+    table_detector = _table_detector() if exclude_tables else None
+    with fitz.open(pdf_path) as pdf_document:
+        return "".join(page_text(page, table_detector, stats) for page in pdf_document)
+
+
+def write_text_layer(pdf_path, text_path, exclude_tables=False, stats=None):
+    """
+    Write the text layer of a PDF to `text_path` page by page and return the page count.
+
+    The text goes to a temporary file that replaces `text_path` only when complete,
+    and the file content is the same as `extract_text(pdf_path, exclude_tables)`.
+    """
+    table_detector = _table_detector() if exclude_tables else None
+    tmp_path = text_path + ".tmp"
+    with fitz.open(pdf_path) as pdf_document, open(tmp_path, "w", encoding="utf-8") as text_file:
+        for page in pdf_document:
+            text_file.write(page_text(page, table_detector, stats))
+        n_pages = len(pdf_document)
+    os.replace(tmp_path, text_path)
+    return n_pages
+
+
+def file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+# File ghi kèm mỗi file văn bản: chế độ trích xuất (có bỏ bảng hay không) và thống kê phần chữ bị bỏ
+TEXT_META_SUFFIX = ".meta.json"
+
+
+def read_text_meta(text_path):
+    """
+    Extraction mode and table statistics stored next to `text_path`.
+
+    Outputs written before the sidecar existed hold the full text layer, so a missing
+    sidecar reads as {"exclude_tables": False}.
+    """
+    meta_path = text_path + TEXT_META_SUFFIX
+    if not os.path.exists(meta_path):
+        return {"exclude_tables": False}
+    try:
+        with open(meta_path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except ValueError:
+        return {"exclude_tables": None}
+
+
+def write_text_meta(text_path, exclude_tables, stats=None):
+    with open(text_path + TEXT_META_SUFFIX, "w", encoding="utf-8") as f:
+        json.dump({"exclude_tables": exclude_tables, "stats": stats or {}}, f)
+
+
+def is_text_up_to_date(pdf_path, text_path, skip="mtime", exclude_tables=False):
+    """
+    Whether `text_path` already holds the text of `pdf_path`, extracted in the same mode.
+
+    `skip="mtime"`: the output is newer than the PDF. `skip="hash"`: the SHA-256 of the
+    PDF equals the one stored next to the output (`<text_path>.sha256`) when it was
+    written, which survives copies that reset mtimes. `skip=None` never skips. In every
+    case the output must have been written with the same `exclude_tables`
+    (`<text_path>.meta.json`), so switching the mode re-extracts existing outputs.
+    """
+    if skip is None or not os.path.exists(text_path):
+        return False
+    if read_text_meta(text_path).get("exclude_tables") != exclude_tables:
+        return False
+    if skip == "hash":
+        hash_path = text_path + ".sha256"
+        if not os.path.exists(hash_path):
+            return False
+        with open(hash_path, "r", encoding="utf-8") as f:
+            return f.read().strip() == file_sha256(pdf_path)
+    return os.path.getmtime(text_path) >= os.path.getmtime(pdf_path)
+
+
+def _extract_text_file(pdf_path, text_path, skip, exclude_tables=False):
+    start_time = time.perf_counter()
+    if is_text_up_to_date(pdf_path, text_path, skip, exclude_tables):
+        # Thống kê bỏ bảng của lần trích xuất trước để báo cáo phủ cả các file được bỏ qua
+        return dict(read_text_meta(text_path).get("stats", {}), file=pdf_path, status="skipped", pages=0,
+                    seconds=time.perf_counter() - start_time)
+    # Đánh dấu "đang ghi" trước: nếu bị ngắt giữa chừng, lần sau file không được coi là mới
+    write_text_meta(text_path, None)
+    stats = {}
+    n_pages = write_text_layer(pdf_path, text_path, exclude_tables, stats)
+    if skip == "hash":
+        with open(text_path + ".sha256", "w", encoding="utf-8") as f:
+            f.write(file_sha256(pdf_path))
+    write_text_meta(text_path, exclude_tables, stats)
+    return dict(stats, file=pdf_path, status="done", pages=n_pages, seconds=time.perf_counter() - start_time)
+
+
+def extract_text_files(jobs, workers=None, skip="mtime", exclude_tables=False):
+    """
+    Extract the text layer for a list of (pdf_path, text_path) pairs in a process pool.
+
+    Up-to-date outputs are skipped (see `is_text_up_to_date`). Prints and returns
+    one result per file; failed files get an "error: ..." status. With
+    `exclude_tables`, the text of tables is left out (see `page_text`) and the share of
+    characters removed before correction and tokenization is printed, for extracted and
+    skipped files alike (the latter from their `.meta.json`).
+    """
+    results = []
+    start_time = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = {executor.submit(_extract_text_file, pdf_path, text_path, skip, exclude_tables): pdf_path
+                   for pdf_path, text_path in jobs}
+        for future in as_completed(futures):
+            try:
+                result = future.result()
+            except Exception as e:
+                result = {"file": futures[future], "status": f"error: {e}", "pages": 0, "seconds": 0.0}
+            results.append(result)
+
+    elapsed = time.perf_counter() - start_time
+    statuses = [result["status"] for result in results]
+    n_pages = sum(result["pages"] for result in results)
+    print(f"Extracted {statuses.count('done')} PDFs ({n_pages} pages), skipped {statuses.count('skipped')} "
+          f"up-to-date, {len(results) - statuses.count('done') - statuses.count('skipped')} errors "
+          f"in {elapsed:.1f}s ({n_pages / elapsed if elapsed else 0:.1f} pages/sec)")
+    if exclude_tables:
+        chars = sum(result.get("chars", 0) for result in results)
+        table_chars = sum(result.get("table_chars", 0) for result in results)
+        print(f"Excluded {sum(result.get('tables', 0) for result in results)} tables on "
+              f"{sum(result.get('table_pages', 0) for result in results)} pages: {table_chars}/{chars} characters "
+              f"({table_chars / chars if chars else 0:.1%}) not sent to correction and tokenization")
+    return results
+
+
+def _folder_jobs(source_folder_path, destination_folder_path):
     # Get a list of all PDF files in the source folder
-    pdf_files = [f for f in os.listdir(source_folder_path) if f.lower().endswith('.pdf')]
+    pdf_files = sorted(f for f in os.listdir(source_folder_path) if f.lower().endswith('.pdf'))
 
     # Ensure the destination folder exists
     os.makedirs(destination_folder_path, exist_ok=True)
+    return [(os.path.join(source_folder_path, pdf_file),
+             os.path.join(destination_folder_path, os.path.splitext(pdf_file)[0] + '.txt'))
+            for pdf_file in pdf_files]
 
-    # Iterate over each PDF file
-    for pdf_file in pdf_files:
-        pdf_path = os.path.join(source_folder_path, pdf_file)
-        text_path = os.path.join(destination_folder_path, os.path.splitext(pdf_file)[0] + '.txt')
 
-        # Extract text without tables
-        text = extract_text(pdf_path)
+def convert_pdfs_in_folder(source_folder_path, destination_folder_path, workers=None, skip="mtime",
+                           exclude_tables=False):
+    return extract_text_files(_folder_jobs(source_folder_path, destination_folder_path), workers=workers, skip=skip,
+                              exclude_tables=exclude_tables)
 
-        # Write the extracted text to a text file in the destination folder
-        with open(text_path, "w", encoding="utf-8") as text_file:
-            text_file.write(text)
 
-def process_pdfs_for_all_years(start_year, end_year):
+def process_pdfs_for_all_years(start_year, end_year, workers=None, skip="mtime", exclude_tables=False):
+    # Gom file của mọi năm vào một pool để các năm ít file không làm các worker rảnh
+    jobs = []
     for year in range(start_year, end_year + 1):
         source_folder_path = f'data/{year}/Edited_pdf'
         destination_folder_path = f'data/{year}/Edited_text'
-        convert_pdfs_in_folder(source_folder_path, destination_folder_path)
-        print(f'Processed PDFs for the year {year}')    
+        if not os.path.isdir(source_folder_path):
+            print(f'Skipped year {year}: {source_folder_path} not found')
+            continue
+        jobs += _folder_jobs(source_folder_path, destination_folder_path)
+    return extract_text_files(jobs, workers=workers, skip=skip, exclude_tables=exclude_tables)
+
+# Ký tự được giữ lại khi làm sạch văn bản: chữ cái (kể cả tiếng Việt), chữ số, dấu câu cơ bản và khoảng trắng
+ALLOWED_TEXT_CHARS = frozenset(string.ascii_letters + string.digits + ".,?!ăâđêôơưĂÂĐÊÔƠƯáàạảãâấầậẩẫăắằặẳẵéèẹẻẽêếềệểễíìịỉĩóòọỏõôốồộổỗơớờợởỡúùụủũưứừựửữýỳỵỷỹÁÀẠẢÃÂẤẦẬẨẪĂẮẰẶẲẴÉÈẸẺẼÊẾỀỆỂỄÍÌỊỈĨÓÒỌỎÕÔỐỒỘỔỖƠỚỜỢỞỠÚÙỤỦŨƯỨỪỰỬỮÝỲỴỶỸ ")
+# Số ký tự đọc mỗi lần khi làm sạch một file
+CLEAN_CHUNK_SIZE = 1 << 20
+
+
+class _CleanTable(dict):
+    """str.translate table keeping ALLOWED_TEXT_CHARS and deleting every other character, filled lazily."""
+
+    def __missing__(self, codepoint):
+        value = codepoint if chr(codepoint) in ALLOWED_TEXT_CHARS else None
+        self[codepoint] = value
+        return value
+
+
+CLEAN_TABLE = _CleanTable()
+
 
 def process_text_file(content):
-    # Loại bỏ các khoảng trắng thừa (giữ lại khoảng trắng phân cách giữa các từ)
-    content_single_space = re.sub(r'\s+', ' ', content).strip()
+    # Gộp mọi khoảng trắng thành một dấu cách (split() cắt theo cùng tập ký tự với \s), rồi bỏ ký tự không cần thiết
+    return ' '.join(content.split()).translate(CLEAN_TABLE)
 
-    # Loại bỏ các ký tự không cần thiết (giữ lại chữ cái, chữ số và dấu câu cơ bản)
-    cleaned_content = re.sub(r'[^a-zA-Z0-9.,?!ăâđêôơưĂÂĐÊÔƠƯáàạảãâấầậẩẫăắằặẳẵéèẹẻẽêếềệểễíìịỉĩóòọỏõôốồộổỗơớờợởỡúùụủũưứừựửữýỳỵỷỹÁÀẠẢÃÂẤẦẬẨẪĂẮẰẶẲẴÉÈẸẺẼÊẾỀỆỂỄÍÌỊỈĨÓÒỌỎÕÔỐỒỘỔỖƠỚỜỢỞỠÚÙỤỦŨƯỨỪỰỬỮÝỲỴỶỸ ]', '', content_single_space)
 
-    return cleaned_content
+def clean_text_chunks(chunks):
+    """
+    Streaming `process_text_file`: yield the cleaned text of an iterable of string chunks.
 
-def process_files_txt_in_folder(input_folder, output_folder):
-    # Tạo thư mục đầu ra nếu nó không tồn tại
-    if not os.path.exists(output_folder):
-        os.makedirs(output_folder)
+    The token at the end of a chunk may continue in the next one, so it is held back
+    until a whitespace (or the end of the input) is seen. Joining the output gives
+    exactly `process_text_file("".join(chunks))`.
+    """
+    pending = ""
+    started = False
+    for chunk in chunks:
+        data = pending + chunk
+        tokens = data.split()
+        pending = tokens.pop() if tokens and not data[-1].isspace() else ""
+        if tokens:
+            yield (' ' if started else '') + ' '.join(tokens).translate(CLEAN_TABLE)
+            started = True
+    if pending:
+        yield (' ' if started else '') + pending.translate(CLEAN_TABLE)
 
-    # Duyệt qua tất cả các file trong thư mục đầu vào
-    for filename in os.listdir(input_folder):
-        if filename.endswith('.txt'):
-            input_file_path = os.path.join(input_folder, filename)
-            output_file_path = os.path.join(output_folder, filename)
 
-            # Đọc nội dung của file
-            with open(input_file_path, 'r', encoding='utf-8') as file:
-                content = file.read()
+def process_text_path(input_file_path, output_file_path, chunk_size=CLEAN_CHUNK_SIZE):
+    with open(input_file_path, 'r', encoding='utf-8') as input_file, \
+            open(output_file_path, 'w', encoding='utf-8') as output_file:
+        for piece in clean_text_chunks(iter(lambda: input_file.read(chunk_size), '')):
+            output_file.write(piece)
+    return output_file_path
 
-            # Xử lý nội dung của file
-            processed_content = process_text_file(content)
 
-            # Lưu nội dung đã xử lý vào file mới
-            with open(output_file_path, 'w', encoding='utf-8') as file:
-                file.write(processed_content)
+def process_files_txt_in_folder(input_folder, output_folder, workers=None):
+    # Tạo thư mục đầu ra nếu nó không tồn tại
+    if not os.path.exists(output_folder):
+        os.makedirs(output_folder)
 
-            print(f"File {filename} đã được xử lý và lưu tại: {output_file_path}")
\ No newline at end of file
+    # Xử lý song song các file, mỗi file được đọc và ghi theo từng đoạn
+    filenames = [filename for filename in os.listdir(input_folder) if filename.endswith('.txt')]
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = {executor.submit(process_text_path, os.path.join(input_folder, filename),
+                                   os.path.join(output_folder, filename)): filename
+                   for filename in filenames}
+        for future in as_completed(futures):
+            output_file_path = future.result()
+            print(f"File {futures[future]} đã được xử lý và lưu tại: {output_file_path}")
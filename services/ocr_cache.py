@@ -0,0 +1,112 @@
+import os
+import hashlib
+import threading
+import tempfile
+from PIL import ImageOps
+
+DEFAULT_CACHE_DIR = os.environ.get("OCR_CACHE_DIR", os.path.expanduser("~/.cache/pdf_ocr"))
+DEFAULT_MAX_BYTES = 512 * 1024 * 1024
+
+
+class OCRCache:
+    """
+    On-disk cache of OCR results keyed by (page content hash, dpi, lang, Tesseract config).
+
+    Each entry is a small UTF-8 text file. A hit refreshes the file's mtime, and when
+    the directory grows past `max_bytes` the least recently used entries are deleted.
+    The directory can be shared by several processes: writes are atomic renames and
+    eviction tolerates entries removed by someone else.
+    """
+
+    def __init__(self, cache_dir: str = DEFAULT_CACHE_DIR, max_bytes: int = DEFAULT_MAX_BYTES):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        os.makedirs(cache_dir, exist_ok=True)
+        self._size = sum(size for _, _, size in self._entries())
+
+    @staticmethod
+    def make_key(page, dpi, lang: str, config: str = "") -> str:
+        """`page` is a PIL image or an (size, grayscale bytes) payload from `ocr_engine.encode_page`."""
+        if isinstance(page, tuple):
+            size, data = page
+        else:
+            gray = page if page.mode == "L" else ImageOps.grayscale(page)
+            size, data = gray.size, gray.tobytes()
+        digest = hashlib.sha256(f"{size[0]}x{size[1]}|".encode())
+        digest.update(data)
+        digest.update(f"|{dpi}|{lang}|{config}".encode())
+        return digest.hexdigest()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, key[:2], key + ".txt")
+
+    def get(self, key: str):
+        path = self._path(key)
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                text = f.read()
+            os.utime(path)
+        except FileNotFoundError:
+            with self._lock:
+                self.misses += 1
+            return None
+        with self._lock:
+            self.hits += 1
+        return text
+
+    def put(self, key: str, text: str):
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        data = text.encode("utf-8")
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        # Ghi đè một mục đã có chỉ thay đổi dung lượng bằng phần chênh lệch
+        try:
+            old_size = os.stat(path).st_size
+        except FileNotFoundError:
+            old_size = 0
+        os.replace(tmp_path, path)
+        with self._lock:
+            self._size += len(data) - old_size
+            if self._size > self.max_bytes:
+                self._evict()
+
+    def _entries(self):
+        for sub_dir in os.scandir(self.cache_dir):
+            if not sub_dir.is_dir():
+                continue
+            for entry in os.scandir(sub_dir.path):
+                if entry.name.endswith(".txt"):
+                    try:
+                        stat = entry.stat()
+                    except FileNotFoundError:
+                        continue
+                    yield entry.path, stat.st_mtime, stat.st_size
+
+    def _evict(self):
+        # Xoá các mục ít được dùng gần đây nhất cho đến khi còn 90% dung lượng cho phép
+        entries = sorted(self._entries(), key=lambda entry: entry[1])
+        self._size = sum(size for _, _, size in entries)
+        target = self.max_bytes * 0.9
+        for path, _, size in entries:
+            if self._size <= target:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            self._size -= size
+
+    @property
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+            "size_bytes": self._size,
+        }
@@ -0,0 +1,248 @@
+import os
+import json
+import time
+import multiprocessing
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, wait, FIRST_COMPLETED
+from PIL import Image, ImageOps
+from services.page_precheck import TEXT, classify_page
+from services.tesseract_batch import image_to_string, image_to_data, image_to_string_batch, image_to_data_batch
+
+BACKENDS = ("thread", "process")
+# "string": văn bản của trang; "data": (văn bản, độ tin cậy trung bình) dựng từ image_to_data
+OUTPUTS = ("string", "data")
+DEFAULT_LANG = "vie+eng"
+
+
+def _init_worker(omp_thread_limit: int):
+    # Tesseract đọc OMP_THREAD_LIMIT khi khởi động, tiến trình con kế thừa biến môi trường này
+    os.environ["OMP_THREAD_LIMIT"] = str(omp_thread_limit)
+
+
+def encode_page(img) -> tuple:
+    """Convert a page to the compact form sent to workers: ((width, height), grayscale bytes)."""
+    gray = img if img.mode == "L" else ImageOps.grayscale(img)
+    return gray.size, gray.tobytes()
+
+
+def decode_page(payload: tuple) -> Image.Image:
+    size, data = payload
+    return Image.frombytes("L", size, data)
+
+
+def ocr_image(img, lang: str = DEFAULT_LANG, config: str = "") -> str:
+    return image_to_string(img, lang=lang, config=config)
+
+
+def ocr_page(payload: tuple, lang: str = DEFAULT_LANG, config: str = "") -> str:
+    return ocr_image(decode_page(payload), lang=lang, config=config)
+
+
+def ocr_page_batch(payloads: list, lang: str = DEFAULT_LANG, config: str = "") -> list:
+    # Cả lô trang chạy trong một tiến trình tesseract, mô hình ngôn ngữ chỉ nạp một lần
+    return image_to_string_batch([decode_page(payload) for payload in payloads], lang=lang, config=config,
+                                 batch_size=0)
+
+
+def text_and_confidence(data: dict) -> tuple:
+    """
+    Page text and mean word confidence (0-100) from an `image_to_data` dict.
+
+    Words are joined by spaces, lines by newlines and paragraphs by a blank line.
+    A page without any recognised word has confidence 0.
+    """
+    paragraphs = {}
+    confs = []
+    for i, word in enumerate(data.get("text", [])):
+        word = str(word).strip()
+        if data["level"][i] != 5 or not word:
+            continue
+        para = (data["block_num"][i], data["par_num"][i])
+        paragraphs.setdefault(para, {}).setdefault(data["line_num"][i], []).append(word)
+        if float(data["conf"][i]) >= 0:
+            confs.append(float(data["conf"][i]))
+    text = "\n\n".join("\n".join(" ".join(words) for words in lines.values()) for lines in paragraphs.values())
+    return text, sum(confs) / len(confs) if confs else 0.0
+
+
+def ocr_page_data(payload: tuple, lang: str = DEFAULT_LANG, config: str = "") -> tuple:
+    return text_and_confidence(image_to_data(decode_page(payload), lang=lang, config=config))
+
+
+def ocr_page_data_batch(payloads: list, lang: str = DEFAULT_LANG, config: str = "") -> list:
+    return [text_and_confidence(data)
+            for data in image_to_data_batch([decode_page(payload) for payload in payloads], lang=lang,
+                                            config=config, batch_size=0)]
+
+
+_WORKER_FUNCTIONS = {"string": (ocr_page, ocr_page_batch), "data": (ocr_page_data, ocr_page_data_batch)}
+
+
+class OCREngine:
+    """
+    Executor for page OCR with an explicit worker count and Tesseract thread limit.
+
+    `backend` is "thread" (workers are threads, each waiting on its own tesseract
+    subprocess) or "process" (a spawn-started process pool). Total CPU use is roughly
+    `max_workers * omp_thread_limit`, so keep that product at or below the core count.
+    With `batch_size > 1`, `map_pages` sends pages to the workers in groups that are
+    OCRed by a single tesseract process (see services.tesseract_batch). With
+    `precheck=True` pages classified as blank or picture by services.page_precheck
+    are not OCRed.
+    """
+
+    def __init__(self, backend: str = "thread", max_workers: int = None, omp_thread_limit: int = 1,
+                 lang: str = DEFAULT_LANG, config: str = "", cache=None, batch_size: int = 1,
+                 precheck: bool = False):
+        if backend not in BACKENDS:
+            raise ValueError(f"Unknown OCR backend '{backend}', expected one of {BACKENDS}")
+        self.backend = backend
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self.omp_thread_limit = omp_thread_limit
+        self.lang = lang
+        self.config = config
+        self.cache = cache
+        self.batch_size = max(1, batch_size)
+        self.precheck = precheck
+        self.pages = 0
+        self.busy_time = 0.0
+        self._executor = None
+
+    def _get_executor(self):
+        if self._executor is None:
+            if self.backend == "process":
+                self._executor = ProcessPoolExecutor(max_workers=self.max_workers,
+                                                     mp_context=multiprocessing.get_context("spawn"),
+                                                     initializer=_init_worker,
+                                                     initargs=(self.omp_thread_limit,))
+            else:
+                self._executor = ThreadPoolExecutor(max_workers=self.max_workers,
+                                                    initializer=_init_worker,
+                                                    initargs=(self.omp_thread_limit,))
+        return self._executor
+
+    def submit(self, img):
+        return self._submit_payload(encode_page(img))
+
+    def _submit_payload(self, payload: tuple):
+        return self._get_executor().submit(ocr_page, payload, self.lang, self.config)
+
+    def _submit_batch(self, payloads: list, output: str = "string"):
+        single, batch = _WORKER_FUNCTIONS[output]
+        if len(payloads) == 1:
+            return self._get_executor().submit(single, payloads[0], self.lang, self.config)
+        return self._get_executor().submit(batch, payloads, self.lang, self.config)
+
+    def map_pages(self, images, max_pending: int = None, dpi: int = None, slots=None, output: str = "string",
+                  page_classes: dict = None):
+        """
+        OCR an iterable of page images, yielding (index, text) in completion order.
+
+        With `output="data"` pages are read with `image_to_data` and each result is a
+        (text, mean word confidence) tuple instead of the text. When the engine has
+        `precheck` on, blank and picture pages are yielded at once with an empty text
+        (and confidence 100) and `page_classes`, if given, counts the pages per class.
+
+        At most `max_pending` pages (default: twice the worker count) are encoded and
+        in flight at once, so a lazy page iterator is consumed only as fast as the
+        workers drain it; finished pages are yielded after every submission without
+        waiting for that limit. A page that fails to OCR yields an empty string. When the
+        engine has a cache, `dpi` becomes part of the cache key and cached pages are
+        yielded without being sent to a worker. `slots` is an optional object with
+        acquire()/release(), taken before each submission and released when the page
+        finishes, used to share the workers between several callers. With batching,
+        a page is submitted once `batch_size` pages are gathered (or the iterator ends)
+        and its text is yielded together with the rest of its batch.
+        """
+        if output not in OUTPUTS:
+            raise ValueError(f"Unknown OCR output '{output}', expected one of {OUTPUTS}")
+        max_pending = max(max_pending or self.max_workers * 2, self.batch_size)
+        cache_config = self.config if output == "string" else f"{self.config} output={output}"
+        pending = {}
+        cache_keys = {}
+        batch_idxs, batch_payloads = [], []
+        start_time = time.perf_counter()
+        try:
+            for idx, img in enumerate(images):
+                if self.precheck:
+                    page_class = classify_page(img)
+                    if page_classes is not None:
+                        page_classes[page_class] = page_classes.get(page_class, 0) + 1
+                    if page_class != TEXT:
+                        self.pages += 1
+                        yield idx, "" if output == "string" else ("", 100.0)
+                        continue
+                payload = encode_page(img)
+                if self.cache is not None:
+                    key = self.cache.make_key(payload, dpi, self.lang, cache_config)
+                    text = self.cache.get(key)
+                    if text is not None:
+                        self.pages += 1
+                        yield idx, text if output == "string" else tuple(json.loads(text))
+                        continue
+                    cache_keys[idx] = key
+                batch_idxs.append(idx)
+                batch_payloads.append(payload)
+                if len(batch_idxs) < self.batch_size:
+                    continue
+                self._submit_pending(batch_idxs, batch_payloads, pending, slots, output)
+                batch_idxs, batch_payloads = [], []
+                # Trang đã xong được trả ngay, không đợi đến khi đủ max_pending trang đang chạy
+                yield from self._collect([future for future in pending if future.done()], pending, cache_keys, output)
+                while sum(len(idxs) for idxs in pending.values()) >= max_pending:
+                    done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                    yield from self._collect(done, pending, cache_keys, output)
+            if batch_idxs:
+                self._submit_pending(batch_idxs, batch_payloads, pending, slots, output)
+            while pending:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                yield from self._collect(done, pending, cache_keys, output)
+        finally:
+            for future in pending:
+                future.cancel()
+            self.busy_time += time.perf_counter() - start_time
+
+    def _submit_pending(self, idxs: list, payloads: list, pending: dict, slots=None, output: str = "string"):
+        # Mỗi lô chiếm một slot vì nó chỉ dùng một worker
+        if slots is not None:
+            slots.acquire()
+            try:
+                future = self._submit_batch(payloads, output)
+            except Exception:
+                slots.release()
+                raise
+            future.add_done_callback(lambda _: slots.release())
+        else:
+            future = self._submit_batch(payloads, output)
+        pending[future] = idxs
+
+    def _collect(self, done, pending: dict, cache_keys: dict, output: str = "string"):
+        for future in done:
+            idxs = pending.pop(future)
+            try:
+                texts = future.result()
+            except Exception:
+                texts = ["" if output == "string" else ("", 0.0)] * len(idxs)
+            else:
+                if not isinstance(texts, list):
+                    texts = [texts]
+                for idx, text in zip(idxs, texts):
+                    if idx in cache_keys:
+                        self.cache.put(cache_keys.pop(idx), text if output == "string" else json.dumps(text))
+            for idx, text in zip(idxs, texts):
+                self.pages += 1
+                yield idx, text
+
+    @property
+    def pages_per_sec(self) -> float:
+        return self.pages / self.busy_time if self.busy_time > 0 else 0.0
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=True, cancel_futures=True)
+            self._executor = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.shutdown()
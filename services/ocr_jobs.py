@@ -0,0 +1,225 @@
+import os
+import time
+import uuid
+import shutil
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from services.ocr_engine import OCREngine
+from services.ocr_cache import OCRCache
+from services.pdf_converter import OCR_DPI, MIN_TEXT_LAYER_CHARS, count_pdf_pages, convert_pdf_to_text
+
+QUEUED, RUNNING, DONE, FAILED = "queued", "running", "done", "failed"
+# Thư mục tạm của job đã xong bị xoá sau khoảng thời gian này (giây)
+JOB_TTL = 3600
+
+
+class FairShareLimiter:
+    """
+    Global cap on in-flight OCR pages, split evenly across the jobs that are running.
+
+    A job may have at most `max(1, capacity // running jobs)` pages in flight, and
+    never more than `capacity` pages are in flight in total.
+    """
+
+    def __init__(self, capacity: int):
+        self.capacity = capacity
+        self.in_flight = {}
+        self._condition = threading.Condition()
+
+    def register(self, job_id: str):
+        with self._condition:
+            self.in_flight[job_id] = 0
+            self._condition.notify_all()
+
+    def unregister(self, job_id: str):
+        with self._condition:
+            self.in_flight.pop(job_id, None)
+            self._condition.notify_all()
+
+    def _share(self) -> int:
+        return max(1, self.capacity // max(1, len(self.in_flight)))
+
+    def acquire(self, job_id: str):
+        with self._condition:
+            self._condition.wait_for(lambda: sum(self.in_flight.values()) < self.capacity
+                                     and self.in_flight[job_id] < self._share())
+            self.in_flight[job_id] += 1
+
+    def release(self, job_id: str):
+        with self._condition:
+            if job_id in self.in_flight:
+                self.in_flight[job_id] -= 1
+            self._condition.notify_all()
+
+    def for_job(self, job_id: str):
+        return _JobSlots(self, job_id)
+
+
+class _JobSlots:
+    def __init__(self, limiter: FairShareLimiter, job_id: str):
+        self.limiter = limiter
+        self.job_id = job_id
+
+    def acquire(self):
+        self.limiter.acquire(self.job_id)
+
+    def release(self):
+        self.limiter.release(self.job_id)
+
+
+class OCRJob:
+    def __init__(self, job_id: str, work_dir: str, use_text_layer: bool = True, fast: bool = False):
+        self.job_id = job_id
+        self.work_dir = work_dir
+        self.pdf_path = os.path.join(work_dir, "input.pdf")
+        self.output_path = os.path.join(work_dir, "output_text.txt")
+        self.use_text_layer = use_text_layer
+        self.fast = fast
+        self.stats = {}
+        self.status = QUEUED
+        self.error = None
+        self.total_pages = 0
+        self.completed_pages = 0
+        self.pages = {}
+        self.submitted_at = time.time()
+        self.started_at = None
+        self.first_text_at = None
+        self.finished_at = None
+        self._lock = threading.Lock()
+
+    def add_page(self, page_num: int, text: str):
+        with self._lock:
+            self.pages[page_num] = text
+            self.completed_pages = len(self.pages)
+            if self.first_text_at is None and text.strip():
+                self.first_text_at = time.time()
+
+    def text_so_far(self) -> str:
+        """Text of the pages finished so far, in page order."""
+        with self._lock:
+            return "\n".join(self.pages[page_num] for page_num in sorted(self.pages))
+
+    @property
+    def time_to_first_text(self):
+        if self.first_text_at is None:
+            return None
+        return self.first_text_at - self.started_at
+
+    @property
+    def elapsed(self) -> float:
+        if self.started_at is None:
+            return 0.0
+        return (self.finished_at or time.time()) - self.started_at
+
+    @property
+    def pages_per_sec(self) -> float:
+        return self.completed_pages / self.elapsed if self.elapsed else 0.0
+
+
+class OCRJobQueue:
+    """
+    Process-wide queue of PDF conversion jobs shared by all Streamlit sessions.
+
+    Each job gets its own id and temporary directory. At most `max_running_jobs` jobs
+    convert at once, and all of them share one OCR engine whose `max_workers` pages
+    are divided fairly between the running jobs.
+    """
+
+    def __init__(self, max_workers: int = None, max_running_jobs: int = 4, backend: str = "thread",
+                 omp_thread_limit: int = 1, cache: OCRCache = None, batch_size: int = 1, precheck: bool = True):
+        self.engine = OCREngine(backend=backend, max_workers=max_workers,
+                                omp_thread_limit=omp_thread_limit, cache=cache, batch_size=batch_size,
+                                precheck=precheck)
+        self.limiter = FairShareLimiter(self.engine.max_workers)
+        self.max_running_jobs = max_running_jobs
+        self.jobs = {}
+        self._lock = threading.Lock()
+        self._runners = ThreadPoolExecutor(max_workers=max_running_jobs, thread_name_prefix="ocr-job")
+
+    def submit(self, pdf_bytes: bytes, use_text_layer: bool = True, fast: bool = False) -> str:
+        self.cleanup()
+        job_id = uuid.uuid4().hex
+        job = OCRJob(job_id, tempfile.mkdtemp(prefix=f"ocr_job_{job_id}_"), use_text_layer, fast)
+        with open(job.pdf_path, "wb") as f:
+            f.write(pdf_bytes)
+        with self._lock:
+            self.jobs[job_id] = job
+        self._runners.submit(self._run, job)
+        return job_id
+
+    def get(self, job_id: str):
+        with self._lock:
+            return self.jobs.get(job_id)
+
+    def queue_position(self, job_id: str) -> int:
+        # Vị trí (bắt đầu từ 1) của job trong số các job đang chờ, 0 nếu job không còn chờ
+        with self._lock:
+            queued = sorted((job for job in self.jobs.values() if job.status == QUEUED),
+                            key=lambda job: job.submitted_at)
+        for position, job in enumerate(queued, start=1):
+            if job.job_id == job_id:
+                return position
+        return 0
+
+    def counts(self) -> dict:
+        with self._lock:
+            statuses = [job.status for job in self.jobs.values()]
+        return {status: statuses.count(status) for status in (QUEUED, RUNNING, DONE, FAILED)}
+
+    def _run(self, job: OCRJob):
+        job.status = RUNNING
+        job.started_at = time.time()
+        self.limiter.register(job.job_id)
+        try:
+            job.total_pages = count_pdf_pages(job.pdf_path)
+            text = convert_pdf_to_text(job.pdf_path, self.engine, dpi=OCR_DPI,
+                                       min_text_chars=MIN_TEXT_LAYER_CHARS if job.use_text_layer else None,
+                                       on_page=job.add_page, slots=self.limiter.for_job(job.job_id),
+                                       fast=job.fast, stats=job.stats)
+            with open(job.output_path, "w", encoding="utf-8") as f:
+                f.write(text)
+            job.status = DONE
+        except Exception as e:
+            job.error = str(e)
+            job.status = FAILED
+        finally:
+            self.limiter.unregister(job.job_id)
+            job.finished_at = time.time()
+
+    def discard(self, job_id: str):
+        with self._lock:
+            job = self.jobs.get(job_id)
+            if job is None or job.status in (QUEUED, RUNNING):
+                return
+            del self.jobs[job_id]
+        shutil.rmtree(job.work_dir, ignore_errors=True)
+
+    def cleanup(self, ttl: float = JOB_TTL):
+        now = time.time()
+        with self._lock:
+            expired = [job_id for job_id, job in self.jobs.items()
+                       if job.finished_at is not None and now - job.finished_at > ttl]
+        for job_id in expired:
+            self.discard(job_id)
+
+
+_job_queue = None
+_job_queue_lock = threading.Lock()
+
+
+def get_job_queue() -> OCRJobQueue:
+    """Return the process-wide job queue, configured from OCR_* environment variables on first use."""
+    global _job_queue
+    with _job_queue_lock:
+        if _job_queue is None:
+            max_workers = int(os.environ.get("OCR_MAX_WORKERS", 0)) or None
+            cache = None if os.environ.get("OCR_CACHE", "1") == "0" else OCRCache()
+            _job_queue = OCRJobQueue(max_workers=max_workers,
+                                     max_running_jobs=int(os.environ.get("OCR_MAX_JOBS", 4)),
+                                     backend=os.environ.get("OCR_BACKEND", "thread"),
+                                     omp_thread_limit=int(os.environ.get("OCR_OMP_THREAD_LIMIT", 1)),
+                                     cache=cache,
+                                     batch_size=int(os.environ.get("OCR_BATCH_SIZE", 1)),
+                                     precheck=os.environ.get("OCR_PRECHECK", "1") != "0")
+        return _job_queue
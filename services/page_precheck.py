@@ -0,0 +1,85 @@
+"""
+Cheap pixel-statistics check that tells blank and picture-only pages from text pages
+before they are sent to Tesseract.
+
+The page is reduced so that its longer side is at most PRECHECK_SIZE pixels, then
+dark pixels are labelled into connected components. Printed characters show up as
+many small components; a photo is mostly mid-tone pixels with its ink in a few large
+blobs; a blank or separator page has almost no ink and at most a couple of
+character-like components. A page with only a few components, most of its ink in
+character-like ones (a heading such as "MỤC LỤC" or a year), is text. Pages that are
+not clearly blank or picture are classified as text, so a doubtful page is still OCRed.
+"""
+from collections import Counter
+import numpy as np
+from PIL import ImageOps
+from scipy import ndimage
+
+BLANK, PICTURE, TEXT = "blank", "picture", "text"
+PAGE_CLASSES = (BLANK, PICTURE, TEXT)
+
+# Cạnh dài nhất của ảnh thu nhỏ dùng để kiểm tra
+PRECHECK_SIZE = 600
+# Điểm ảnh tối hơn ngưỡng này là mực, trong khoảng MIDTONE_RANGE là vùng ảnh chụp
+INK_THRESHOLD = 128
+MIDTONE_RANGE = (60, 200)
+# Diện tích (theo tỉ lệ trang thu nhỏ) của một thành phần liên thông giống ký tự
+MIN_CHAR_AREA = 2
+MAX_CHAR_AREA_RATIO = 0.002
+# Trang có ít hơn số thành phần giống ký tự này không được coi là trang chữ
+MIN_TEXT_COMPONENTS = 15
+# Từ số thành phần giống ký tự này trở lên, trang luôn được OCR (ví dụ ảnh kèm đoạn chữ)
+MANY_TEXT_COMPONENTS = 200
+# Trang trống: tỉ lệ mực, tỉ lệ vùng xám và số thành phần giống ký tự tối đa
+BLANK_MAX_INK_RATIO = 0.01
+BLANK_MAX_MIDTONE_RATIO = 0.05
+BLANK_MAX_CHAR_COMPONENTS = 2
+# Trang có ít thành phần giống ký tự nhưng phần lớn mực nằm trong chúng (ví dụ chỉ có tiêu đề "MỤC LỤC") là trang chữ
+FEW_GLYPHS_MIN_CHAR_INK_SHARE = 0.5
+# Trang ảnh: phần lớn là vùng xám và phần mực nằm trong các ký tự chỉ chiếm một phần nhỏ
+PICTURE_MIN_MIDTONE_RATIO = 0.4
+PICTURE_MAX_CHAR_INK_SHARE = 0.2
+
+
+def page_statistics(img) -> dict:
+    """Ink, mid-tone and connected-component statistics of a downscaled grayscale copy of `img`."""
+    gray = img if img.mode == "L" else ImageOps.grayscale(img)
+    factor = max(1, -(-max(gray.size) // PRECHECK_SIZE))
+    if factor > 1:
+        gray = gray.reduce(factor)
+    pixels = np.asarray(gray)
+    ink = pixels < INK_THRESHOLD
+    labels, n_components = ndimage.label(ink, structure=np.ones((3, 3), dtype=bool))
+    areas = np.bincount(labels.ravel())[1:]
+    char_like = (areas >= MIN_CHAR_AREA) & (areas <= MAX_CHAR_AREA_RATIO * pixels.size)
+    ink_pixels = int(areas.sum())
+    return {
+        "ink_ratio": ink_pixels / pixels.size,
+        "midtone_ratio": float(((pixels >= MIDTONE_RANGE[0]) & (pixels < MIDTONE_RANGE[1])).mean()),
+        "char_components": int(char_like.sum()),
+        "char_ink_share": int(areas[char_like].sum()) / ink_pixels if ink_pixels else 0.0,
+    }
+
+
+def classify_page(img) -> str:
+    """Return BLANK, PICTURE or TEXT for a rendered page."""
+    stats = page_statistics(img)
+    if stats["char_components"] < MIN_TEXT_COMPONENTS:
+        if (stats["char_components"] <= BLANK_MAX_CHAR_COMPONENTS and stats["ink_ratio"] < BLANK_MAX_INK_RATIO
+                and stats["midtone_ratio"] < BLANK_MAX_MIDTONE_RATIO):
+            return BLANK
+        # Vài ký tự rõ ràng (tiêu đề, số năm) vẫn phải OCR
+        if stats["char_ink_share"] >= FEW_GLYPHS_MIN_CHAR_INK_SHARE:
+            return TEXT
+        if stats["ink_ratio"] < BLANK_MAX_INK_RATIO and stats["midtone_ratio"] < BLANK_MAX_MIDTONE_RATIO:
+            return BLANK
+        return PICTURE
+    if (stats["char_components"] < MANY_TEXT_COMPONENTS
+            and stats["midtone_ratio"] >= PICTURE_MIN_MIDTONE_RATIO
+            and stats["char_ink_share"] < PICTURE_MAX_CHAR_INK_SHARE):
+        return PICTURE
+    return TEXT
+
+
+def new_class_counts() -> Counter:
+    return Counter({page_class: 0 for page_class in PAGE_CLASSES})
@@ -0,0 +1,118 @@
+import fitz  # PyMuPDF
+from pdf2image import convert_from_path, pdfinfo_from_path
+from services.ocr_engine import OCREngine
+from services.page_precheck import new_class_counts
+
+OCR_DPI = 150
+# Số ký tự (không tính khoảng trắng) tối thiểu để coi một trang là có lớp văn bản
+MIN_TEXT_LAYER_CHARS = 50
+# Chế độ nhanh: OCR mọi trang ở FAST_DPI, chỉ OCR lại ở độ phân giải đầy đủ các trang có
+# độ tin cậy trung bình của từ thấp hơn FAST_MIN_CONFIDENCE
+FAST_DPI = 100
+FAST_MIN_CONFIDENCE = 75
+
+
+def count_pdf_pages(pdf_path: str) -> int:
+    return pdfinfo_from_path(pdf_path)["Pages"]
+
+
+def iter_pdf_images(pdf_path: str, dpi: int = OCR_DPI, chunk_size: int = 4, pages: list = None):
+    """
+    Render pages lazily, at most `chunk_size` pages per pdf2image call.
+
+    `pages` is an optional sorted list of 1-based page numbers; by default every page
+    is rendered. Consecutive page numbers are rendered as one page range.
+    """
+    if pages is None:
+        pages = range(1, count_pdf_pages(pdf_path) + 1)
+    pages = list(pages)
+    start = 0
+    while start < len(pages):
+        end = start + 1
+        while end < len(pages) and end - start < chunk_size and pages[end] == pages[end - 1] + 1:
+            end += 1
+        for img in convert_from_path(pdf_path, dpi=dpi, first_page=pages[start], last_page=pages[end - 1]):
+            yield img
+        start = end
+
+
+def route_pages(pdf_path: str, min_chars: int = MIN_TEXT_LAYER_CHARS) -> tuple:
+    """
+    Split a PDF into pages readable from the text layer and pages that need OCR.
+
+    Returns
+    -------
+    Tuple: (text_pages, ocr_pages)
+        - `text_pages`: dict {page number (1-based): text layer of the page}.
+        - `ocr_pages`: sorted list of page numbers with fewer than `min_chars` selectable characters.
+    """
+    text_pages = {}
+    ocr_pages = []
+    with fitz.open(pdf_path) as pdf_document:
+        for page_num, page in enumerate(pdf_document, start=1):
+            text = page.get_text()
+            if len("".join(text.split())) >= min_chars:
+                text_pages[page_num] = text
+            else:
+                ocr_pages.append(page_num)
+    return text_pages, ocr_pages
+
+
+def convert_pdf_to_text(pdf_path: str, engine: OCREngine, dpi: int = OCR_DPI,
+                        min_text_chars: int = MIN_TEXT_LAYER_CHARS, on_page=None, slots=None,
+                        fast: bool = False, fast_dpi: int = FAST_DPI, min_confidence: float = FAST_MIN_CONFIDENCE,
+                        stats: dict = None) -> str:
+    """
+    Convert a PDF to text, OCRing only the pages without a usable text layer.
+
+    `on_page(page_num, text)` is called once per page as soon as its text is known:
+    first for every text-layer page, then for OCR pages in completion order.
+    Set `min_text_chars` to None to OCR every page. `slots` is passed on to
+    `OCREngine.map_pages` to limit this document's share of the OCR workers.
+
+    With `fast=True` OCR pages are first read at `fast_dpi` with `image_to_data`; only
+    pages whose mean word confidence is below `min_confidence` are rendered again and
+    OCRed at `dpi`. `stats`, if given, is filled with the number of pages taken from
+    the text layer, accepted from the fast pass and re-OCRed at full resolution, and
+    with the pre-check class counts (`page_classes`) when the engine has `precheck` on.
+    """
+    if min_text_chars is None:
+        text_pages, ocr_pages = {}, list(range(1, count_pdf_pages(pdf_path) + 1))
+    else:
+        text_pages, ocr_pages = route_pages(pdf_path, min_text_chars)
+
+    results = dict(text_pages)
+    if on_page is not None:
+        for page_num, text in text_pages.items():
+            on_page(page_num, text)
+
+    fast_pages = 0
+    page_classes = new_class_counts()
+    if fast and ocr_pages:
+        low_confidence = []
+        images = iter_pdf_images(pdf_path, dpi=fast_dpi, chunk_size=engine.max_workers, pages=ocr_pages)
+        for idx, (text, confidence) in engine.map_pages(images, dpi=fast_dpi, slots=slots, output="data",
+                                                             page_classes=page_classes):
+            page_num = ocr_pages[idx]
+            if confidence < min_confidence:
+                low_confidence.append(page_num)
+                continue
+            results[page_num] = text
+            fast_pages += 1
+            if on_page is not None:
+                on_page(page_num, text)
+        ocr_pages = sorted(low_confidence)
+
+    images = iter_pdf_images(pdf_path, dpi=dpi, chunk_size=engine.max_workers, pages=ocr_pages)
+    # Ở lượt thứ hai chỉ còn các trang chữ đã được đếm ở lượt nhanh
+    for idx, text in engine.map_pages(images, dpi=dpi, slots=slots, page_classes=None if fast else page_classes):
+        page_num = ocr_pages[idx]
+        results[page_num] = text
+        if on_page is not None:
+            on_page(page_num, text)
+
+    if stats is not None:
+        stats.update(text_layer_pages=len(text_pages), fast_pages=fast_pages, full_dpi_pages=len(ocr_pages))
+        if engine.precheck:
+            stats["page_classes"] = dict(page_classes)
+    return "\n".join(results[page_num] for page_num in sorted(results))
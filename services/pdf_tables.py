@@ -0,0 +1,155 @@
+"""
+Tables of text-layer PDFs, read without OCR.
+
+Each page is rendered in grayscale at a reduced resolution (TABLE_DPI); `Image_PDF`
+finds the tables and cells on that image and `convert_position_img2pdf` maps their
+boxes back to PDF coordinates. The text of each cell is then read from the PDF text
+layer inside the cell rectangle, and every table becomes a DataFrame. Pages with
+fewer than MIN_TEXT_LAYER_CHARS selectable characters are not processed; their
+numbers are returned in `stats["scanned_pages"]` so they can be OCRed instead.
+
+    tables = extract_pdf_tables("data/2020/Edited_pdf/report.pdf", workers=8)
+"""
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+import fitz  # PyMuPDF
+import numpy as np
+import pandas as pd
+from services.TableDetectionService import Image_PDF
+from services.pdf_converter import MIN_TEXT_LAYER_CHARS
+
+# Độ phân giải để tìm bảng: đủ để ô của một dòng chữ thường cao hơn 20 px (ngưỡng của find_rect_cells)
+TABLE_DPI = 120
+# Các cạnh ô lệch nhau không quá số điểm (pt) này được coi là cùng một dòng/cột của bảng
+CELL_ALIGN_TOLERANCE = 4
+
+
+def render_gray(page, dpi: int = TABLE_DPI) -> np.ndarray:
+    pixmap = page.get_pixmap(dpi=dpi, colorspace=fitz.csGRAY)
+    return np.frombuffer(pixmap.samples, dtype=np.uint8).reshape(pixmap.height, pixmap.width).copy()
+
+
+def read_cells(words: list, cell_boxes: list) -> list:
+    """
+    Text of each cell box (x0, y0, x1, y1), from the words of `page.get_text("words")`.
+
+    A word belongs to the box that contains its centre; the boxes returned by
+    `convert_position_img2pdf` are padded and overlap their neighbours, so a word in
+    several boxes goes to the one whose centre is nearest. Words keep the reading
+    order of the text layer.
+    """
+    boxes = np.array(cell_boxes, dtype=float).reshape(-1, 4)
+    centres = (boxes[:, :2] + boxes[:, 2:]) / 2
+    cell_words = [[] for _ in cell_boxes]
+    for x0, y0, x1, y1, text, *_ in words:
+        x, y = (x0 + x1) / 2, (y0 + y1) / 2
+        inside = np.flatnonzero((boxes[:, 0] <= x) & (x <= boxes[:, 2]) & (boxes[:, 1] <= y) & (y <= boxes[:, 3]))
+        if len(inside) == 0:
+            continue
+        nearest = inside[np.argmin(np.hypot(centres[inside, 0] - x, centres[inside, 1] - y))]
+        cell_words[nearest].append(text)
+    return [" ".join(texts) for texts in cell_words]
+
+
+def _grid_positions(values: list, tolerance: float) -> list:
+    # Gom các toạ độ gần nhau (<= tolerance) thành một chỉ số dòng/cột
+    positions = {}
+    index, start = -1, None
+    for value in sorted(set(values)):
+        if start is None or value - start > tolerance:
+            index, start = index + 1, value
+        positions[value] = index
+    return [positions[value] for value in values]
+
+
+def cells_to_dataframe(cell_boxes: list, texts: list, tolerance: float = CELL_ALIGN_TOLERANCE) -> pd.DataFrame:
+    """
+    Lay cells out as a DataFrame: rows and columns come from the top and left edges of
+    the cell boxes (x0, y0, x1, y1), edges at most `tolerance` apart being aligned. A
+    merged cell is written at its top-left position; missing cells are "".
+    """
+    rows = _grid_positions([box[1] for box in cell_boxes], tolerance)
+    columns = _grid_positions([box[0] for box in cell_boxes], tolerance)
+    table = [[""] * (max(columns, default=-1) + 1) for _ in range(max(rows, default=-1) + 1)]
+    for row, column, text in zip(rows, columns, texts):
+        table[row][column] = f"{table[row][column]} {text}".strip()
+    return pd.DataFrame(table)
+
+
+def detect_tables(page, detector: Image_PDF = None, dpi: int = TABLE_DPI) -> list:
+    """
+    Tables of one fitz page in PDF coordinates, as returned by `convert_position_img2pdf`:
+    [[table box (x0, y0, x1, y1), [[cell box, cell image], ...]], ...]. Candidates that
+    `extract_cells` does not accept as a table are left out.
+    """
+    detector = detector or Image_PDF(emptiness_check="none")
+    image = render_gray(page, dpi)
+    position_tables, image_tables = detector.extract_tables(image)
+    pos_img = []
+    for table_pos, table_img in zip(position_tables, image_tables):
+        is_table, position_cells, image_cells = detector.extract_cells(table_img, table_pos)
+        if is_table and position_cells:
+            pos_img.append([table_pos, [[cell_pos, cell_img] for cell_pos, cell_img in zip(position_cells, image_cells)]])
+    return detector.convert_position_img2pdf(pos_img, page, image)
+
+
+def page_tables(page, detector: Image_PDF = None, dpi: int = TABLE_DPI) -> list:
+    """Tables of one text-layer fitz page as DataFrames, top to bottom. Tables without any text are dropped."""
+    pdf_tables = detect_tables(page, detector, dpi)
+    if not pdf_tables:
+        return []
+
+    words = page.get_text("words")
+    tables = []
+    for table_box, pdf_cells in pdf_tables:
+        cell_boxes = [cell_box for cell_box, _ in pdf_cells]
+        texts = read_cells(words, cell_boxes)
+        if any(texts):
+            tables.append(cells_to_dataframe(cell_boxes, texts))
+    return tables
+
+
+def _page_tables_worker(pdf_path: str, page_numbers: list, dpi: int, min_text_chars: int) -> dict:
+    # Mỗi worker mở tài liệu một lần cho cả nhóm trang của nó; None đánh dấu trang không có lớp văn bản
+    detector = Image_PDF(emptiness_check="none")
+    results = {}
+    with fitz.open(pdf_path) as pdf_document:
+        for page_num in page_numbers:
+            page = pdf_document[page_num - 1]
+            if len("".join(page.get_text().split())) < min_text_chars:
+                results[page_num] = None
+            else:
+                results[page_num] = page_tables(page, detector, dpi)
+    return results
+
+
+def extract_pdf_tables(pdf_path: str, workers: int = None, dpi: int = TABLE_DPI,
+                       min_text_chars: int = MIN_TEXT_LAYER_CHARS, stats: dict = None) -> dict:
+    """
+    Return {page number (1-based): [DataFrame, ...]} for the text-layer pages of a PDF.
+
+    Pages are split between `workers` processes. `stats`, if given, is filled with the
+    number of pages, tables and cells, the elapsed time and the list of `scanned_pages`
+    (no text layer, not processed).
+    """
+    start_time = time.perf_counter()
+    with fitz.open(pdf_path) as pdf_document:
+        n_pages = len(pdf_document)
+    workers = max(1, min(workers or os.cpu_count(), n_pages))
+    # Chia trang xen kẽ để các trang nhiều bảng không dồn vào một worker
+    chunks = [list(range(first + 1, n_pages + 1, workers)) for first in range(workers)]
+    results = {}
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        for chunk_results in executor.map(_page_tables_worker, [pdf_path] * workers, chunks,
+                                          [dpi] * workers, [min_text_chars] * workers):
+            results.update(chunk_results)
+
+    tables = {page_num: results[page_num] for page_num in sorted(results) if results[page_num] is not None}
+    if stats is not None:
+        stats.update(pages=n_pages,
+                     scanned_pages=sorted(page_num for page_num, result in results.items() if result is None),
+                     tables=sum(len(page_results) for page_results in tables.values()),
+                     cells=sum(df.size for page_results in tables.values() for df in page_results),
+                     seconds=time.perf_counter() - start_time)
+    return tables
@@ -0,0 +1,106 @@
+"""
+OCR of table cells with a few Tesseract runs per table instead of one per cell.
+
+The cell images returned by `Image_PDF.extract_cells` are stacked, one under the
+other and separated by MOSAIC_GAP white rows, into mosaic pages of at most
+MOSAIC_MAX_HEIGHT pixels. The mosaics of a table are OCRed in one tesseract process
+with `image_to_data_batch`, and each word goes back to the cell whose vertical band
+of the mosaic contains the centre of the word. Stacking cells vertically keeps
+Tesseract from merging words of neighbouring cells into one line.
+
+    detector = Image_PDF()
+    tables = ocr_page_tables(page_image, detector)
+"""
+from bisect import bisect_right
+import numpy as np
+from services.TableDetectionService import Image_PDF
+from services.pdf_tables import cells_to_dataframe
+from services.tesseract_batch import image_to_data_batch, image_to_string
+
+OCR_LANG = "vie+eng"
+# Khoảng trắng (px) giữa hai ô trong ảnh ghép, đủ lớn để Tesseract tách thành các dòng riêng
+MOSAIC_GAP = 30
+# Chiều cao tối đa của một ảnh ghép, dưới giới hạn 32767 px của Tesseract
+MOSAIC_MAX_HEIGHT = 16000
+# Cạnh ô (px) lệch nhau không quá số này được coi là cùng một dòng/cột của bảng
+CELL_ALIGN_TOLERANCE_PX = 10
+
+
+def build_mosaics(image_cells: list) -> list:
+    """
+    Stack grayscale cell images into mosaics.
+
+    Returns [(mosaic, starts, first_cell), ...]: `starts` holds the top row of each cell
+    of the mosaic and `first_cell` the index of its first cell in `image_cells`.
+    """
+    mosaics = []
+    group, height = [], MOSAIC_GAP
+    for idx, cell in enumerate(image_cells):
+        if group and height + cell.shape[0] + MOSAIC_GAP > MOSAIC_MAX_HEIGHT:
+            mosaics.append(_paste(image_cells, group, height))
+            group, height = [], MOSAIC_GAP
+        group.append(idx)
+        height += cell.shape[0] + MOSAIC_GAP
+    if group:
+        mosaics.append(_paste(image_cells, group, height))
+    return mosaics
+
+
+def _paste(image_cells: list, group: list, height: int) -> tuple:
+    width = max(image_cells[idx].shape[1] for idx in group) + 2 * MOSAIC_GAP
+    mosaic = np.full((height, width), 255, dtype=np.uint8)
+    starts = []
+    top = MOSAIC_GAP
+    for idx in group:
+        cell = image_cells[idx]
+        mosaic[top:top + cell.shape[0], MOSAIC_GAP:MOSAIC_GAP + cell.shape[1]] = cell
+        starts.append(top)
+        top += cell.shape[0] + MOSAIC_GAP
+    return mosaic, starts, group[0]
+
+
+def ocr_cells(image_cells: list, lang: str = OCR_LANG, config: str = "") -> list:
+    """Text of each cell image (words joined by single spaces), from one tesseract run over its mosaics."""
+    texts = [[] for _ in image_cells]
+    if not image_cells:
+        return []
+    mosaics = build_mosaics(image_cells)
+    results = image_to_data_batch([mosaic for mosaic, _, _ in mosaics], lang=lang, config=config, batch_size=0)
+    for (_, starts, first_cell), data in zip(mosaics, results):
+        for top, height, text in zip(data["top"], data["height"], data["text"]):
+            if not str(text).strip():
+                continue
+            # Ô chứa từ là ô có hàng bắt đầu lớn nhất không vượt quá tâm của từ
+            cell = bisect_right(starts, int(top) + int(height) / 2) - 1
+            texts[first_cell + max(cell, 0)].append(str(text).strip())
+    return [" ".join(words) for words in texts]
+
+
+def ocr_cells_separately(image_cells: list, lang: str = OCR_LANG, config: str = "") -> list:
+    """One `image_to_string` per cell, in the same format as `ocr_cells` (reference for the mosaic)."""
+    return [" ".join(image_to_string(cell, lang=lang, config=config).split()) for cell in image_cells]
+
+
+def ocr_table(detector: Image_PDF, table_img: np.ndarray, table_pos: tuple, lang: str = OCR_LANG,
+              mosaic: bool = True):
+    """
+    DataFrame of one table found by `extract_tables`, or None when `extract_cells` does
+    not accept it as a table. `mosaic=False` OCRs the cells one by one.
+    """
+    is_table, position_cells, image_cells = detector.extract_cells(table_img, table_pos)
+    if not is_table or not position_cells:
+        return None
+    texts = (ocr_cells if mosaic else ocr_cells_separately)(image_cells, lang=lang)
+    cell_boxes = [(x, y, x + w, y + h) for x, y, w, h in position_cells]
+    return cells_to_dataframe(cell_boxes, texts, tolerance=CELL_ALIGN_TOLERANCE_PX)
+
+
+def ocr_page_tables(image: np.ndarray, detector: Image_PDF = None, lang: str = OCR_LANG, mosaic: bool = True) -> list:
+    """Tables of a grayscale page image as DataFrames, top to bottom."""
+    detector = detector or Image_PDF()
+    tables = []
+    for table_pos, table_img in zip(*detector.extract_tables(image)):
+        table = ocr_table(detector, table_img, table_pos, lang=lang, mosaic=mosaic)
+        if table is not None:
+            tables.append(table)
+    return tables
@@ -0,0 +1,204 @@
+"""
+Tesseract calls without per-image disk round trips.
+
+Every `pytesseract.image_to_string`/`image_to_data` call starts a new `tesseract`
+process that reloads the language models, which costs more than recognising a small
+crop, and writes the image and the result to temporary files on disk.
+
+`image_to_string`/`image_to_data` pass a single image to tesseract in memory, and
+`image_to_string_batch`/`image_to_data_batch` run tesseract once for many images
+and split the output back per image. Results are the same as calling pytesseract
+image by image.
+
+How images reach tesseract is set by `configure_handoff` (or the OCR_HANDOFF and
+OCR_SCRATCH_DIR environment variables):
+    - "pipe" (default): a single image is sent over stdin and the result read from
+      stdout. A batch needs image paths in a list file, so it is written to the
+      scratch directory.
+    - "ramdisk": single images and batches are written to the scratch directory.
+    - "file": pytesseract's temporary files and the system temp directory, as before.
+The scratch directory defaults to /dev/shm (RAM-backed) when it exists.
+"""
+import os
+import sys
+import uuid
+import shlex
+import shutil
+import subprocess
+import tempfile
+import threading
+from io import BytesIO
+import numpy as np
+from PIL import Image
+import pytesseract
+from pytesseract.pytesseract import run_tesseract, file_to_dict, prepare, subprocess_args, get_errors
+
+HANDOFFS = ("pipe", "ramdisk", "file")
+# Số ảnh tối đa trong một lần gọi tesseract
+DEFAULT_BATCH_SIZE = 64
+# Ký tự Tesseract ghi sau mỗi trang ở đầu ra txt, pytesseract.image_to_string trả về cả ký tự này
+PAGE_SEPARATOR = "\f"
+
+_handoff = os.environ.get("OCR_HANDOFF", "pipe")
+_scratch_dir = os.environ.get("OCR_SCRATCH_DIR") or ("/dev/shm" if os.path.isdir("/dev/shm") else None)
+# Số lần gọi theo từng cách và số byte (ảnh + kết quả) đã ghi ra đĩa hoặc tránh ghi ra đĩa
+_stats = {"pipe": 0, "ramdisk": 0, "file": 0, "bytes_avoided": 0, "bytes_written": 0}
+_stats_lock = threading.Lock()
+
+
+def configure_handoff(handoff: str = None, scratch_dir: str = None):
+    """Set how images are passed to tesseract ("pipe", "ramdisk" or "file") and the scratch directory."""
+    global _handoff, _scratch_dir
+    if handoff is not None:
+        if handoff not in HANDOFFS:
+            raise ValueError(f"Unknown tesseract handoff '{handoff}', expected one of {HANDOFFS}")
+        _handoff = handoff
+    if scratch_dir is not None:
+        _scratch_dir = scratch_dir
+
+
+def handoff_stats() -> dict:
+    with _stats_lock:
+        return dict(_stats, handoff=_handoff, scratch_dir=_scratch_dir)
+
+
+def _count(mode: str, n_bytes: int, on_disk: bool):
+    with _stats_lock:
+        _stats[mode] += 1
+        _stats["bytes_written" if on_disk else "bytes_avoided"] += n_bytes
+
+
+def _to_pil(image):
+    return Image.fromarray(image) if isinstance(image, np.ndarray) else image
+
+
+def _chunks(items: list, size: int):
+    size = size or len(items) or 1
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+def _scratch() -> tuple:
+    """Directory for temporary tesseract files and whether it is on disk."""
+    if _handoff == "file" or _scratch_dir is None:
+        return None, True
+    return _scratch_dir, False
+
+
+def _run_pipe(image, extension: str, lang: str, config: str) -> str:
+    """Run tesseract with the image on stdin and the result on stdout."""
+    image, image_format = prepare(_to_pil(image))
+    buffer = BytesIO()
+    image.save(buffer, format=image_format)
+    cmd_args = [pytesseract.pytesseract.tesseract_cmd, "stdin", "stdout"]
+    if lang is not None:
+        cmd_args += ["-l", lang]
+    if config:
+        cmd_args += shlex.split(config, posix=sys.platform != "win32")
+    # Giống run_tesseract: box/osd/tsv/xml được bật qua config, không thêm vào cuối lệnh
+    cmd_args += [ext for ext in extension.split() if ext not in {"box", "osd", "tsv", "xml"}]
+    try:
+        proc = subprocess.Popen(cmd_args, **subprocess_args())
+    except FileNotFoundError:
+        raise pytesseract.TesseractNotFoundError()
+    output, error_string = proc.communicate(buffer.getvalue())
+    if proc.returncode:
+        raise pytesseract.TesseractError(proc.returncode, get_errors(error_string))
+    _count("pipe", buffer.tell() + len(output), on_disk=False)
+    return output.decode("utf-8")
+
+
+def _run_files(images: list, extension: str, lang: str, config: str) -> str:
+    """Run one tesseract process over `images` written to the scratch directory and return its raw output."""
+    scratch_dir, on_disk = _scratch()
+    work_dir = tempfile.mkdtemp(prefix="tess_", dir=scratch_dir)
+    try:
+        paths = []
+        n_bytes = 0
+        for idx, image in enumerate(images):
+            image, image_format = prepare(_to_pil(image))
+            path = os.path.join(work_dir, f"{idx:05d}.{image_format.lower()}")
+            image.save(path, format=image_format)
+            paths.append(path)
+            n_bytes += os.path.getsize(path)
+        if len(paths) == 1:
+            input_path = paths[0]
+        else:
+            input_path = os.path.join(work_dir, "images.txt")
+            with open(input_path, "w", encoding="utf-8") as f:
+                f.write("\n".join(paths) + "\n")
+        output_base = os.path.join(work_dir, "output")
+        run_tesseract(input_path, output_base, extension, lang, config=config)
+        with open(f"{output_base}.{extension}", "rb") as f:
+            output = f.read()
+        _count("file" if on_disk else "ramdisk", n_bytes + len(output), on_disk=on_disk)
+        return output.decode("utf-8")
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+def _run_single(image, extension: str, lang: str, config: str) -> str:
+    if _handoff == "pipe":
+        return _run_pipe(image, extension, lang, config)
+    return _run_files([image], extension, lang, config)
+
+
+def image_to_string(image, lang: str = None, config: str = "") -> str:
+    """`pytesseract.image_to_string` using the configured handoff."""
+    return _run_single(image, "txt", lang, config)
+
+
+def image_to_data(image, lang: str = None, config: str = "") -> dict:
+    """`pytesseract.image_to_data(..., output_type=Output.DICT)` using the configured handoff."""
+    output = _run_single(image, "tsv", lang, f"-c tessedit_create_tsv=1 {config.strip()}")
+    return file_to_dict(output, "\t", -1)
+
+
+def image_to_string_batch(images: list, lang: str = None, config: str = "",
+                          batch_size: int = DEFAULT_BATCH_SIZE) -> list:
+    """
+    Batched `image_to_string`: one text per image, in input order.
+
+    `images` are PIL images or numpy arrays. At most `batch_size` images are sent to
+    one tesseract process (0 sends them all at once).
+    """
+    texts = []
+    for batch in _chunks(list(images), batch_size):
+        if len(batch) == 1:
+            texts.append(image_to_string(batch[0], lang=lang, config=config))
+            continue
+        # Dấu phân trang riêng cho lần chạy này để không nhầm với chữ nhận dạng được trong ảnh
+        separator = f"@@page-{uuid.uuid4().hex}@@"
+        output = _run_files(batch, "txt", lang, f"{config.strip()} -c page_separator={separator}")
+        parts = output.split(separator)
+        if len(parts) < len(batch):
+            raise pytesseract.TesseractError(-1, f"expected {len(batch)} pages in batch output, got {len(parts)}")
+        texts.extend(part + PAGE_SEPARATOR for part in parts[:len(batch)])
+    return texts
+
+
+def image_to_data_batch(images: list, lang: str = None, config: str = "",
+                        batch_size: int = DEFAULT_BATCH_SIZE) -> list:
+    """
+    Batched `image_to_data`: one dict per image.
+
+    Rows of the TSV output are split by their `page_num` column, which Tesseract sets
+    to the (1-based) position of the image in the list; each dict has `page_num` 1,
+    as for a single image.
+    """
+    results = []
+    for batch in _chunks(list(images), batch_size):
+        if len(batch) == 1:
+            results.append(image_to_data(batch[0], lang=lang, config=config))
+            continue
+        output = _run_files(batch, "tsv", lang, f"-c tessedit_create_tsv=1 {config.strip()}")
+        lines = output.strip().split("\n")
+        header, rows = lines[0], lines[1:]
+        page_rows = [[] for _ in batch]
+        for row in rows:
+            cells = row.split("\t")
+            page = int(cells[1]) - 1
+            cells[1] = "1"
+            page_rows[page].append("\t".join(cells))
+        results.extend(file_to_dict("\n".join([header] + page), "\t", -1) for page in page_rows)
+    return results
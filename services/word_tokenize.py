@@ -4,17 +4,27 @@ import unicodedata as ud
 import os
 
 
+# File n-gram theo số âm tiết, thêm mục mới để so khớp cụm dài hơn
+N_GRAM_FILES = {
+    2: 'data/n_gram/bi_grams.txt',
+    3: 'data/n_gram/tri_grams.txt',
+    4: 'data/n_gram/four_grams.txt',
+    5: 'data/n_gram/five_grams.txt',
+    6: 'data/n_gram/six_grams.txt',
+    7: 'data/n_gram/seven_grams.txt',
+}
+# Khoá đánh dấu nút trie là cuối một n-gram (âm tiết không bao giờ là chuỗi rỗng)
+_END = ''
+
+
 class VietnameseTextTokenizer:
-    def __init__(self):
+    def __init__(self, n_gram_files=None):
         # Load Vietnamese dictionary from Viet74K.txt
         self.vietnamese_words = self.load_vietnamese_dictionary('data/Viet74K.txt')
-        # Load N-grams
-        self.bi_grams = self.load_n_grams('data/n_gram/bi_grams.txt')
-        self.tri_grams = self.load_n_grams('data/n_gram/tri_grams.txt')
-        self.four_grams = self.load_n_grams('data/n_gram/four_grams.txt')
-        self.five_grams = self.load_n_grams('data/n_gram/five_grams.txt')
-        self.six_grams = self.load_n_grams('data/n_gram/six_grams.txt')
-        self.seven_grams = self.load_n_grams('data/n_gram/seven_grams.txt')
+        # Load N-grams {n: entries} and index them by syllable
+        n_gram_files = N_GRAM_FILES if n_gram_files is None else n_gram_files
+        self.n_grams = {n: self.load_n_grams(path) for n, path in n_gram_files.items()}
+        self.n_gram_trie = self.build_n_gram_trie(self.n_grams)
 
     def load_vietnamese_dictionary(self, file_path):
         with open(file_path, 'r', encoding='utf-8') as file:
@@ -43,129 +53,51 @@ class VietnameseTextTokenizer:
         tokens = re.findall(patterns, text, re.UNICODE)
         return [token for group in tokens for token in group if token]  # Flatten the list and remove empty strings
 
+    def build_n_gram_trie(self, n_grams):
+        """
+        Syllable trie of the n-gram collections {n: entries}.
+
+        Only entries of exactly n non-empty space-separated syllables are inserted: no
+        other entry can equal n syllables joined by single spaces, so they never matched.
+        """
+        trie = {}
+        for n, entries in n_grams.items():
+            if n < 2:
+                continue
+            for entry in entries:
+                syllables = entry.split(' ')
+                if len(syllables) != n or _END in syllables:
+                    continue
+                node = trie
+                for syllable in syllables:
+                    node = node.setdefault(syllable, {})
+                node[_END] = True
+        return trie
+
     def longest_matching(self, text):
+        """
+        Split `text` into words: at each position, the longest n-gram (n >= 2) of the
+        lowercased syllables that is in the n-gram collections, joined with '_', or else
+        the syllable alone. One walk down `n_gram_trie` per position.
+        """
         syllables = self.syllablize(text)
+        lowered = [syllable.lower() for syllable in syllables]
         syl_len = len(syllables)
 
         curr_id = 0
         word_list = []
-        done = False
-
-        while (curr_id < syl_len) and (not done):
-            curr_word = syllables[curr_id]
-            if curr_id >= syl_len - 1:
-                word_list.append(curr_word)
-                done = True
-            else:
-                next_word = syllables[curr_id + 1]
-                pair_word = ' '.join([curr_word.lower(), next_word.lower()])
-
-                if curr_id >= (syl_len - 2):
-                    if pair_word in self.bi_grams:
-                        word_list.append('_'.join([curr_word, next_word]))
-                        curr_id += 2
-                    else:
-                        word_list.append(curr_word)
-                        curr_id += 1
-                else:
-                    next_next_word = syllables[curr_id + 2]
-                    triple_word = ' '.join([pair_word, next_next_word.lower()])
-
-                    if curr_id >= (syl_len - 3):
-                        if triple_word in self.tri_grams:
-                            word_list.append('_'.join([curr_word, next_word, next_next_word]))
-                            curr_id += 3
-                        elif pair_word in self.bi_grams:
-                            word_list.append('_'.join([curr_word, next_word]))
-                            curr_id += 2
-                        else:
-                            word_list.append(curr_word)
-                            curr_id += 1
-                    else:
-                        next_next_next_word = syllables[curr_id + 3]
-                        four_word = ' '.join([triple_word, next_next_next_word.lower()])
-
-                        if curr_id >= (syl_len - 4):
-                            if self.four_grams and four_word in self.four_grams:
-                                word_list.append('_'.join([curr_word, next_word, next_next_word, next_next_next_word]))
-                                curr_id += 4
-                            elif triple_word in self.tri_grams:
-                                word_list.append('_'.join([curr_word, next_word, next_next_word]))
-                                curr_id += 3
-                            elif pair_word in self.bi_grams:
-                                word_list.append('_'.join([curr_word, next_word]))
-                                curr_id += 2
-                            else:
-                                word_list.append(curr_word)
-                                curr_id += 1
-                        else:
-                            next_next_next_next_word = syllables[curr_id + 4]
-                            five_word = ' '.join([four_word, next_next_next_next_word.lower()])
-
-                            if curr_id >= (syl_len - 5):
-                                if self.five_grams and five_word in self.five_grams:
-                                    word_list.append('_'.join([curr_word, next_word, next_next_word, next_next_next_word, next_next_next_next_word]))
-                                    curr_id += 5
-                                elif self.four_grams and four_word in self.four_grams:
-                                    word_list.append('_'.join([curr_word, next_word, next_next_word, next_next_next_word]))
-                                    curr_id += 4
-                                elif triple_word in self.tri_grams:
-                                    word_list.append('_'.join([curr_word, next_word, next_next_word]))
-                                    curr_id += 3
-                                elif pair_word in self.bi_grams:
-                                    word_list.append('_'.join([curr_word, next_word]))
-                                    curr_id += 2
-                                else:
-                                    word_list.append(curr_word)
-                                    curr_id += 1
-                            else:
-                                next_next_next_next_next_word = syllables[curr_id + 5]
-                                six_word = ' '.join([five_word, next_next_next_next_next_word.lower()])
-
-                                if curr_id >= (syl_len - 6):
-                                    if self.six_grams and six_word in self.six_grams:
-                                        word_list.append('_'.join([curr_word, next_word, next_next_word, next_next_next_word, next_next_next_next_word, next_next_next_next_next_word]))
-                                        curr_id += 6
-                                    elif self.five_grams and five_word in self.five_grams:
-                                        word_list.append('_'.join([curr_word, next_word, next_next_word, next_next_next_word, next_next_next_next_word]))
-                                        curr_id += 5
-                                    elif self.four_grams and four_word in self.four_grams:
-                                        word_list.append('_'.join([curr_word, next_word, next_next_word, next_next_next_word]))
-                                        curr_id += 4
-                                    elif triple_word in self.tri_grams:
-                                        word_list.append('_'.join([curr_word, next_word, next_next_word]))
-                                        curr_id += 3
-                                    elif pair_word in self.bi_grams:
-                                        word_list.append('_'.join([curr_word, next_word]))
-                                        curr_id += 2
-                                    else:
-                                        word_list.append(curr_word)
-                                        curr_id += 1
-                                else:
-                                    next_next_next_next_next_next_word = syllables[curr_id + 6]
-                                    seven_word = ' '.join([six_word, next_next_next_next_next_next_word.lower()])
-
-                                    if self.seven_grams and seven_word in self.seven_grams:
-                                        word_list.append('_'.join([curr_word, next_word, next_next_word, next_next_next_word, next_next_next_next_word, next_next_next_next_next_word, next_next_next_next_next_next_word]))
-                                        curr_id += 7
-                                    elif self.six_grams and six_word in self.six_grams:
-                                        word_list.append('_'.join([curr_word, next_word, next_next_word, next_next_next_word, next_next_next_next_word, next_next_next_next_next_word]))
-                                        curr_id += 6
-                                    elif self.five_grams and five_word in self.five_grams:
-                                        word_list.append('_'.join([curr_word, next_word, next_next_word, next_next_next_word, next_next_next_next_word]))
-                                        curr_id += 5
-                                    elif self.four_grams and four_word in self.four_grams:
-                                        word_list.append('_'.join([curr_word, next_word, next_next_word, next_next_next_word]))
-                                        curr_id += 4
-                                    elif triple_word in self.tri_grams:
-                                        word_list.append('_'.join([curr_word, next_word, next_next_word]))
-                                        curr_id += 3
-                                    elif pair_word in self.bi_grams:
-                                        word_list.append('_'.join([curr_word, next_word]))
-                                        curr_id += 2
-                                    else:
-                                        word_list.append(curr_word)
-                                        curr_id += 1
+        while curr_id < syl_len:
+            # Nhớ độ dài n-gram dài nhất kết thúc trên đường đi xuống trie
+            node = self.n_gram_trie
+            length = 1
+            for idx in range(curr_id, syl_len):
+                node = node.get(lowered[idx])
+                if node is None:
+                    break
+                if _END in node:
+                    length = idx - curr_id + 1
+            word_list.append('_'.join(syllables[curr_id:curr_id + length]))
+            curr_id += length
         return word_list
 
     def remove_punctuation(self, words):
@@ -0,0 +1,177 @@
+"""
+Resumable batch OCR of a folder of scanned PDFs.
+
+Every finished page is appended to `<output>/<name>.journal.jsonl`, so an interrupted
+run picks up at the first unfinished page. The settings of a finished document are kept
+in `<output>/<name>.settings.json`; documents whose `.txt` output is newer than the PDF
+and was written with the same settings are skipped. Documents are processed in parallel
+across processes.
+
+    python -m tools.batch_ocr data/2020/Scanned_pdf data/2020/Scanned_text --workers 16
+"""
+import os
+import json
+import time
+import argparse
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pdf2image import convert_from_path
+from services.ocr_cache import OCRCache
+from services.pdf_converter import count_pdf_pages
+from tools.pdf_to_txt import IMG2Txt
+
+JOURNAL_SUFFIX = ".journal.jsonl"
+SETTINGS_SUFFIX = ".settings.json"
+
+
+def output_paths(pdf_path: str, output_folder: str) -> tuple:
+    name = os.path.splitext(os.path.basename(pdf_path))[0]
+    return os.path.join(output_folder, name + ".txt"), os.path.join(output_folder, name + JOURNAL_SUFFIX)
+
+
+def settings_path(output_path: str) -> str:
+    return os.path.splitext(output_path)[0] + SETTINGS_SUFFIX
+
+
+def is_up_to_date(pdf_path: str, output_path: str, header: dict) -> bool:
+    """True if `output_path` is newer than the PDF and was written with the settings in `header`."""
+    if not os.path.exists(output_path) or os.path.getmtime(output_path) < os.path.getmtime(pdf_path):
+        return False
+    try:
+        with open(settings_path(output_path), "r", encoding="utf-8") as f:
+            return json.load(f) == header
+    except (OSError, ValueError):
+        return False
+
+
+def read_journal(journal_path: str, header: dict) -> dict:
+    """
+    Return {page number: text} from a journal written for the same PDF and settings.
+
+    A journal whose header does not match `header` (the PDF changed or the dpi
+    differs) is ignored. A truncated last line from a crash mid-write is skipped.
+    """
+    pages = {}
+    if not os.path.exists(journal_path):
+        return pages
+    with open(journal_path, "r", encoding="utf-8") as f:
+        lines = f.read().splitlines()
+    if not lines:
+        return pages
+    try:
+        if json.loads(lines[0]) != header:
+            return pages
+    except ValueError:
+        return pages
+    for line in lines[1:]:
+        try:
+            entry = json.loads(line)
+        except ValueError:
+            continue
+        pages[entry["page"]] = entry["text"]
+    return pages
+
+
+def ocr_document(pdf_path: str, output_folder: str, dpi: int = 200, cache_dir: str = None,
+                 single_pass: bool = False, precheck: bool = True) -> dict:
+    output_path, journal_path = output_paths(pdf_path, output_folder)
+    header = {"pdf_mtime": os.path.getmtime(pdf_path), "dpi": dpi, "single_pass": single_pass, "precheck": precheck}
+    if is_up_to_date(pdf_path, output_path, header):
+        return {"file": pdf_path, "status": "skipped", "pages": 0, "resumed_pages": 0}
+
+    pages = read_journal(journal_path, header)
+    resumed_pages = len(pages)
+    total = count_pdf_pages(pdf_path)
+    img2txt = IMG2Txt(cache=OCRCache(cache_dir) if cache_dir else None, single_pass=single_pass, precheck=precheck)
+
+    # Viết lại journal từ các trang hợp lệ để bỏ dòng ghi dở (nếu có) trước khi ghi tiếp
+    tmp_path = journal_path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as journal:
+        journal.write(json.dumps(header) + "\n")
+        for page_num in sorted(pages):
+            journal.write(json.dumps({"page": page_num, "text": pages[page_num]}, ensure_ascii=False) + "\n")
+    os.replace(tmp_path, journal_path)
+
+    with open(journal_path, "a", encoding="utf-8") as journal:
+        for page_num in range(1, total + 1):
+            if page_num in pages:
+                continue
+            img = convert_from_path(pdf_path, dpi=dpi, first_page=page_num, last_page=page_num)[0]
+            text = img2txt.scan_image(img, dpi=dpi) or ""
+            journal.write(json.dumps({"page": page_num, "text": text}, ensure_ascii=False) + "\n")
+            journal.flush()
+            os.fsync(journal.fileno())
+            pages[page_num] = text
+
+    # Giống convert_images_to_text: bỏ trang rỗng, nối các trang bằng một dòng trống
+    text = "\n\n".join(pages[page_num] for page_num in sorted(pages) if pages[page_num])
+    tmp_path = output_path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        f.write(text)
+    os.replace(tmp_path, output_path)
+    # Ghi cấu hình sau văn bản: nếu dừng giữa chừng, lần chạy sau coi tài liệu là chưa xong
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(header, f)
+    os.replace(tmp_path, settings_path(output_path))
+    os.remove(journal_path)
+    return {"file": pdf_path, "status": "done", "pages": total, "resumed_pages": resumed_pages,
+            "page_classes": dict(img2txt.page_classes) if precheck else None}
+
+
+def _ocr_document_worker(pdf_path: str, output_folder: str, dpi: int, cache_dir: str, single_pass: bool,
+                         precheck: bool) -> dict:
+    # Mỗi tài liệu chạy trong một tiến trình riêng, Tesseract chỉ dùng 1 luồng để không tranh CPU
+    os.environ["OMP_THREAD_LIMIT"] = "1"
+    return ocr_document(pdf_path, output_folder, dpi=dpi, cache_dir=cache_dir, single_pass=single_pass,
+                        precheck=precheck)
+
+
+def format_page_classes(page_classes: dict) -> str:
+    if not page_classes:
+        return ""
+    return ", " + ", ".join(f"{count} {page_class}" for page_class, count in page_classes.items())
+
+
+def process_folder(input_folder: str, output_folder: str, workers: int = None, dpi: int = 200,
+                   cache_dir: str = None, single_pass: bool = False, precheck: bool = True) -> list:
+    os.makedirs(output_folder, exist_ok=True)
+    pdf_paths = sorted(os.path.join(input_folder, filename) for filename in os.listdir(input_folder)
+                       if filename.lower().endswith('.pdf'))
+    results = []
+    start_time = time.time()
+    with ProcessPoolExecutor(max_workers=workers or os.cpu_count()) as executor:
+        futures = {executor.submit(_ocr_document_worker, pdf_path, output_folder, dpi, cache_dir,
+                                   single_pass, precheck): pdf_path
+                   for pdf_path in pdf_paths}
+        for future in as_completed(futures):
+            try:
+                result = future.result()
+            except Exception as e:
+                result = {"file": futures[future], "status": f"error: {e}", "pages": 0, "resumed_pages": 0}
+            results.append(result)
+            print(f"[{len(results)}/{len(pdf_paths)}] {os.path.basename(result['file'])}: {result['status']} "
+                  f"({result['pages']} pages, {result['resumed_pages']} resumed from journal"
+                  f"{format_page_classes(result.get('page_classes'))})")
+    elapsed = time.time() - start_time
+    n_pages = sum(result["pages"] - result["resumed_pages"] for result in results)
+    print(f"OCR {n_pages} pages in {elapsed:.1f}s ({n_pages / elapsed if elapsed else 0:.2f} pages/sec)")
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("input_folder")
+    parser.add_argument("output_folder")
+    parser.add_argument("--workers", type=int, default=None, help="Documents processed in parallel (default: CPU count)")
+    parser.add_argument("--dpi", type=int, default=200)
+    parser.add_argument("--cache-dir", default=None, help="Optional OCRCache directory shared by the workers")
+    parser.add_argument("--single-pass", action="store_true",
+                        help="Reuse the words of the first Tesseract pass, re-OCR only low-confidence paragraphs")
+    parser.add_argument("--no-precheck", dest="precheck", action="store_false",
+                        help="OCR every page, including pages detected as blank or picture-only")
+    args = parser.parse_args()
+    process_folder(args.input_folder, args.output_folder, workers=args.workers, dpi=args.dpi,
+                   cache_dir=args.cache_dir, single_pass=args.single_pass, precheck=args.precheck)
+
+
+if __name__ == "__main__":
+    main()
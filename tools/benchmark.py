@@ -0,0 +1,358 @@
+"""
+Benchmarks for the OCR pipeline. Run from the repository root, e.g.:
+
+    python -m tools.benchmark ocr data/report.pdf --backend thread process --workers 4 8 16 --omp-threads 1 2
+    python -m tools.benchmark layout --lines 250 --columns 3
+    python -m tools.benchmark adaptive data/2020/Scanned_pdf/*.pdf --fast-dpi 100 --min-confidence 60 75 85
+    python -m tools.benchmark tables data/2020/Scanned_pdf/report.pdf --pages 10
+    python -m tools.benchmark detection data/2020/Scanned_pdf/report.pdf --pages 10 --dpi 200 300
+    python -m tools.benchmark mosaic data/2020/Scanned_pdf/report.pdf --pages 10
+    python -m tools.benchmark tokenize data/2020/Edited_text/report.txt
+    python -m tools.benchmark overhead --images 100 --batch-size 64 --handoff file pipe ramdisk
+"""
+import argparse
+import itertools
+import random
+import time
+
+
+def bench_ocr(args):
+    from pdf2image import convert_from_path
+    from services.ocr_engine import OCREngine
+
+    images = convert_from_path(args.pdf, dpi=args.dpi, first_page=1, last_page=args.pages)
+    print(f"{len(images)} pages rendered at {args.dpi} dpi")
+    for backend, workers, omp_threads in itertools.product(args.backend, args.workers, args.omp_threads):
+        with OCREngine(backend=backend, max_workers=workers, omp_thread_limit=omp_threads) as engine:
+            # Khởi động pool trước khi đo để không tính thời gian spawn tiến trình
+            engine.submit(images[0]).result()
+            start_time = time.perf_counter()
+            n_pages = sum(1 for _ in engine.map_pages(images))
+            elapsed = time.perf_counter() - start_time
+        print(f"backend={backend:<7} workers={workers:<3} omp_threads={omp_threads:<2} "
+              f"pages={n_pages} elapsed={elapsed:.2f}s pages/sec={n_pages / elapsed:.2f}")
+
+
+def word_similarity(reference: str, text: str) -> float:
+    """Share of matching words between two texts (difflib ratio over word lists), 1.0 when identical."""
+    from difflib import SequenceMatcher
+
+    return SequenceMatcher(None, reference.split(), text.split(), autojunk=False).ratio()
+
+
+def bench_adaptive(args):
+    from services.ocr_engine import OCREngine
+    from services.pdf_converter import convert_pdf_to_text
+
+    def run(pdf_path, **kwargs):
+        pages, stats = {}, {}
+        start_time = time.perf_counter()
+        convert_pdf_to_text(pdf_path, engine, dpi=args.dpi, min_text_chars=None,
+                            on_page=pages.__setitem__, stats=stats, **kwargs)
+        return pages, stats, time.perf_counter() - start_time
+
+    with OCREngine(max_workers=args.workers) as engine:
+        references = {}
+        total_time = 0.0
+        for pdf_path in args.pdf:
+            references[pdf_path], _, elapsed = run(pdf_path)
+            total_time += elapsed
+        n_pages = sum(len(pages) for pages in references.values())
+        print(f"full dpi={args.dpi}: pages={n_pages} elapsed={total_time:.1f}s (reference text)")
+
+        for min_confidence in args.min_confidence:
+            total_time, full_dpi_pages, similarities = 0.0, 0, []
+            for pdf_path in args.pdf:
+                pages, stats, elapsed = run(pdf_path, fast=True, fast_dpi=args.fast_dpi,
+                                            min_confidence=min_confidence)
+                total_time += elapsed
+                full_dpi_pages += stats["full_dpi_pages"]
+                similarities += [word_similarity(references[pdf_path][page_num], text)
+                                 for page_num, text in pages.items()]
+            print(f"fast dpi={args.fast_dpi} min_confidence={min_confidence:<5} elapsed={total_time:.1f}s "
+                  f"re-OCRed={full_dpi_pages}/{n_pages} pages "
+                  f"word similarity to full dpi: mean={sum(similarities) / len(similarities):.3f} "
+                  f"min={min(similarities):.3f}")
+
+
+def render_gray_pages(pdf_path: str, dpi: int, n_pages: int) -> list:
+    import fitz
+    import numpy as np
+
+    pages = []
+    with fitz.open(pdf_path) as pdf_document:
+        for page in list(pdf_document)[:n_pages]:
+            pixmap = page.get_pixmap(dpi=dpi, colorspace=fitz.csGRAY)
+            pages.append(np.frombuffer(pixmap.samples, dtype=np.uint8).reshape(pixmap.height, pixmap.width).copy())
+    return pages
+
+
+def bench_tables(args):
+    from services.TableDetectionService import Image_PDF
+
+    pages = render_gray_pages(args.pdf, args.dpi, args.pages)
+    timings = {}
+    for emptiness_check in ("tesseract", "pixels"):
+        detector = Image_PDF(emptiness_check=emptiness_check)
+        start_time = time.perf_counter()
+        n_cells = 0
+        for page in pages:
+            position_tables, image_tables = detector.extract_tables(page)
+            for table_pos, table_img in zip(position_tables, image_tables):
+                n_cells += len(detector.extract_cells(table_img, table_pos)[1])
+        timings[emptiness_check] = (time.perf_counter() - start_time) / len(pages)
+        print(f"emptiness_check={emptiness_check:<9} {timings[emptiness_check] * 1000:.0f}ms/page cells={n_cells} "
+              f"crops={detector.stats['crops']} tesseract calls={detector.stats['tesseract']} "
+              f"empty={detector.stats['empty']}")
+    print(f"speedup per page: {timings['tesseract'] / timings['pixels']:.1f}x")
+
+
+def box_iou(a: tuple, b: tuple) -> float:
+    """Intersection over union of two (x, y, w, h) boxes."""
+    width = min(a[0] + a[2], b[0] + b[2]) - max(a[0], b[0])
+    height = min(a[1] + a[3], b[1] + b[3]) - max(a[1], b[1])
+    if width <= 0 or height <= 0:
+        return 0.0
+    intersection = width * height
+    return intersection / (a[2] * a[3] + b[2] * b[3] - intersection)
+
+
+def bench_detection(args):
+    from services.TableDetectionService import Image_PDF
+
+    for dpi in args.dpi:
+        pages = render_gray_pages(args.pdf, dpi, args.pages)
+        tables, timings = {}, {}
+        for table_detection in Image_PDF.TABLE_DETECTIONS:
+            detector = Image_PDF(emptiness_check="none", table_detection=table_detection)
+            page_timings = []
+            tables[table_detection] = []
+            for page in pages:
+                start_time = time.perf_counter()
+                tables[table_detection].append(detector.extract_tables(page)[0])
+                page_timings.append(time.perf_counter() - start_time)
+            timings[table_detection] = sum(page_timings) / len(page_timings)
+            print(f"dpi={dpi:<4} table_detection={table_detection:<8} "
+                  f"mean={timings[table_detection] * 1000:.1f}ms/page max={max(page_timings) * 1000:.1f}ms/page "
+                  f"tables={sum(len(page_tables) for page_tables in tables[table_detection])}")
+        # Bảng của chế độ full được coi là tìm lại được nếu có một bảng pyramid trùng IoU >= args.min_iou
+        matched = sum(any(box_iou(full_box, pyramid_box) >= args.min_iou for pyramid_box in pyramid_tables)
+                      for full_tables, pyramid_tables in zip(tables["full"], tables["pyramid"])
+                      for full_box in full_tables)
+        print(f"dpi={dpi:<4} speedup={timings['full'] / timings['pyramid']:.1f}x "
+              f"full tables found by pyramid (IoU >= {args.min_iou}): "
+              f"{matched}/{sum(len(page_tables) for page_tables in tables['full'])}")
+
+
+def bench_mosaic(args):
+    from services import table_ocr, tesseract_batch
+    from services.TableDetectionService import Image_PDF
+
+    detector = Image_PDF()
+    tables = []
+    for page in render_gray_pages(args.pdf, args.dpi, args.pages):
+        for table_pos, table_img in zip(*detector.extract_tables(page)):
+            is_table, _, image_cells = detector.extract_cells(table_img, table_pos)
+            if is_table and image_cells:
+                tables.append(image_cells)
+    n_cells = sum(len(image_cells) for image_cells in tables)
+    print(f"tables={len(tables)} cells={n_cells}")
+    if not tables:
+        return
+
+    results = {}
+    for name, ocr in (("per cell", table_ocr.ocr_cells_separately), ("mosaic", table_ocr.ocr_cells)):
+        before = tesseract_batch.handoff_stats()
+        start_time = time.perf_counter()
+        results[name] = [ocr(image_cells, lang=args.lang) for image_cells in tables]
+        elapsed = time.perf_counter() - start_time
+        after = tesseract_batch.handoff_stats()
+        calls = sum(after[handoff] - before[handoff] for handoff in tesseract_batch.HANDOFFS)
+        print(f"{name:<8} tesseract runs={calls} elapsed={elapsed:.1f}s ({elapsed / len(tables) * 1000:.0f}ms/table)")
+    same = sum(per_cell == mosaic for per_cell_texts, mosaic_texts in zip(results["per cell"], results["mosaic"])
+               for per_cell, mosaic in zip(per_cell_texts, mosaic_texts))
+    similarity = word_similarity(" ".join(map(" ".join, results["per cell"])), " ".join(map(" ".join, results["mosaic"])))
+    print(f"cells with identical text: {same}/{n_cells}, word similarity: {similarity:.3f}")
+
+
+def join_lookup_matching(tokenizer, text: str) -> list:
+    """Longest matching without the trie: join the next n syllables and look them up, for n from the largest down."""
+    syllables = tokenizer.syllablize(text)
+    max_n = max(tokenizer.n_grams)
+    words = []
+    curr_id = 0
+    while curr_id < len(syllables):
+        length = 1
+        for n in range(min(max_n, len(syllables) - curr_id), 1, -1):
+            if ' '.join(syllable.lower() for syllable in syllables[curr_id:curr_id + n]) in tokenizer.n_grams.get(n, ()):
+                length = n
+                break
+        words.append('_'.join(syllables[curr_id:curr_id + length]))
+        curr_id += length
+    return words
+
+
+def bench_tokenize(args):
+    from services.word_tokenize import VietnameseTextTokenizer
+
+    with open(args.text, "r", encoding="utf-8") as f:
+        text = f.read()
+    tokenizer = VietnameseTextTokenizer()
+    results = {}
+    for name, matching in (("join+lookup", lambda: join_lookup_matching(tokenizer, text)),
+                           ("trie", lambda: tokenizer.longest_matching(text))):
+        timings = []
+        for _ in range(args.repeat):
+            start_time = time.perf_counter()
+            results[name] = matching()
+            timings.append(time.perf_counter() - start_time)
+        print(f"{name:<11} tokens={len(results[name])} best={min(timings):.2f}s "
+              f"tokens/sec={len(results[name]) / min(timings):,.0f}")
+    print(f"identical output: {results['trie'] == results['join+lookup']}")
+
+
+def dense_page_words(n_lines: int, n_columns: int, seed: int = 0) -> list:
+    """Synthetic IMG2Txt word boxes for a dense multi-column page (y axis pointing up, as in scan_image)."""
+    rng = random.Random(seed)
+    page_height = 200 + n_lines * 40
+    words = []
+    for column in range(n_columns):
+        y = 50
+        for _ in range(n_lines):
+            x = 50 + column * 900
+            height = rng.choice([10, 12, 14, 24])
+            y += height + rng.choice([4, 6, 8, 30])
+            for _ in range(rng.randint(1, 12)):
+                width = rng.randint(10, 80)
+                text = f"w{len(words)}"
+                words.append({"top": [x, page_height - y], "bot": [x + width, page_height - y - height],
+                              "height": height, "text": text, "len": len(text), "confs": [90.0]})
+                x += width + rng.randint(2, 20)
+    return words
+
+
+def bench_layout(args):
+    from tools.pdf_to_txt import IMG2Txt
+
+    words = dense_page_words(args.lines, args.columns)
+    img2txt = IMG2Txt()
+    timings = []
+    for _ in range(args.repeat):
+        start_time = time.perf_counter()
+        paras = img2txt.group_words([dict(word) for word in words])
+        timings.append(time.perf_counter() - start_time)
+    print(f"words={len(words)} paragraphs={len(paras)} "
+          f"best={min(timings) * 1000:.1f}ms mean={sum(timings) / len(timings) * 1000:.1f}ms")
+
+
+def text_crops(n_images: int, seed: int = 0) -> list:
+    """Small grayscale images of one short line of text each, like table cells or paragraph crops."""
+    from PIL import Image, ImageDraw
+
+    rng = random.Random(seed)
+    images = []
+    for _ in range(n_images):
+        text = " ".join(str(rng.randint(0, 99999)) for _ in range(rng.randint(1, 4)))
+        img = Image.new("L", (40 + 40 * len(text.split()), 40), 255)
+        ImageDraw.Draw(img).text((10, 12), text, fill=0)
+        images.append(img.resize((img.width * 3, img.height * 3)))
+    return images
+
+
+def bench_overhead(args):
+    from services import tesseract_batch
+
+    images = text_crops(args.images)
+    per_image = {}
+    for handoff in args.handoff:
+        tesseract_batch.configure_handoff(handoff)
+        before = tesseract_batch.handoff_stats()
+        start_time = time.perf_counter()
+        for img in images:
+            tesseract_batch.image_to_string(img, lang=args.lang)
+        per_image[handoff] = (time.perf_counter() - start_time) / len(images)
+        after = tesseract_batch.handoff_stats()
+        print(f"handoff={handoff:<7} one process per image={per_image[handoff] * 1000:.1f}ms/image "
+              f"disk written={(after['bytes_written'] - before['bytes_written']) / 1024:.0f}KB "
+              f"disk avoided={(after['bytes_avoided'] - before['bytes_avoided']) / 1024:.0f}KB")
+
+    start_time = time.perf_counter()
+    tesseract_batch.image_to_string_batch(images, lang=args.lang, batch_size=args.batch_size)
+    batched = (time.perf_counter() - start_time) / len(images)
+    baseline = args.handoff[0]
+    print(f"images={len(images)} batched (batch_size={args.batch_size}, handoff={args.handoff[-1]})="
+          f"{batched * 1000:.1f}ms/image speedup vs {baseline}={per_image[baseline] / batched:.1f}x")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    ocr_parser = subparsers.add_parser("ocr", help="Page OCR throughput (pages/sec) across engine settings")
+    ocr_parser.add_argument("pdf")
+    ocr_parser.add_argument("--dpi", type=int, default=150)
+    ocr_parser.add_argument("--pages", type=int, default=20, help="Number of leading pages to OCR")
+    ocr_parser.add_argument("--backend", nargs="+", default=["thread"], choices=["thread", "process"])
+    ocr_parser.add_argument("--workers", nargs="+", type=int, default=[4])
+    ocr_parser.add_argument("--omp-threads", nargs="+", type=int, default=[1])
+    ocr_parser.set_defaults(func=bench_ocr)
+
+    adaptive_parser = subparsers.add_parser("adaptive", help="Time and text agreement of the fast (adaptive dpi) "
+                                                             "mode against OCR at full dpi")
+    adaptive_parser.add_argument("pdf", nargs="+")
+    adaptive_parser.add_argument("--dpi", type=int, default=150)
+    adaptive_parser.add_argument("--fast-dpi", type=int, default=100)
+    adaptive_parser.add_argument("--min-confidence", nargs="+", type=float, default=[60, 75, 85])
+    adaptive_parser.add_argument("--workers", type=int, default=None)
+    adaptive_parser.set_defaults(func=bench_adaptive)
+
+    tables_parser = subparsers.add_parser("tables", help="Table/cell detection per page, Tesseract vs pixel "
+                                                         "emptiness check")
+    tables_parser.add_argument("pdf")
+    tables_parser.add_argument("--dpi", type=int, default=200)
+    tables_parser.add_argument("--pages", type=int, default=10)
+    tables_parser.set_defaults(func=bench_tables)
+
+    detection_parser = subparsers.add_parser("detection", help="Table detection latency per page, full resolution "
+                                                               "vs downscaled pyramid")
+    detection_parser.add_argument("pdf")
+    detection_parser.add_argument("--dpi", nargs="+", type=int, default=[200])
+    detection_parser.add_argument("--pages", type=int, default=10)
+    detection_parser.add_argument("--min-iou", type=float, default=0.8)
+    detection_parser.set_defaults(func=bench_detection)
+
+    mosaic_parser = subparsers.add_parser("mosaic", help="Table cell OCR, one Tesseract run per cell vs one per "
+                                                         "table (cell mosaic)")
+    mosaic_parser.add_argument("pdf")
+    mosaic_parser.add_argument("--dpi", type=int, default=200)
+    mosaic_parser.add_argument("--pages", type=int, default=10)
+    mosaic_parser.add_argument("--lang", default="vie+eng")
+    mosaic_parser.set_defaults(func=bench_mosaic)
+
+    tokenize_parser = subparsers.add_parser("tokenize", help="VietnameseTextTokenizer longest matching throughput "
+                                                             "(tokens/sec), syllable trie vs join and look up")
+    tokenize_parser.add_argument("text", help="Text file, e.g. the extracted text of an annual report")
+    tokenize_parser.add_argument("--repeat", type=int, default=3)
+    tokenize_parser.set_defaults(func=bench_tokenize)
+
+    layout_parser = subparsers.add_parser("layout", help="IMG2Txt word/line/paragraph grouping on a dense page")
+    layout_parser.add_argument("--lines", type=int, default=250, help="Text lines per column")
+    layout_parser.add_argument("--columns", type=int, default=3)
+    layout_parser.add_argument("--repeat", type=int, default=5)
+    layout_parser.set_defaults(func=bench_layout)
+
+    overhead_parser = subparsers.add_parser("overhead", help="Per-image Tesseract cost on small crops, "
+                                                             "one process per image vs batched")
+    overhead_parser.add_argument("--images", type=int, default=100)
+    overhead_parser.add_argument("--batch-size", type=int, default=64, help="Images per tesseract run (0: all)")
+    overhead_parser.add_argument("--lang", default="vie")
+    overhead_parser.add_argument("--handoff", nargs="+", default=["file", "pipe", "ramdisk"],
+                                 choices=["file", "pipe", "ramdisk"], help="How images are passed to tesseract")
+    overhead_parser.set_defaults(func=bench_overhead)
+
+    args = parser.parse_args()
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,26 +1,76 @@
 import os
+import numpy as np
 from pdf2image import convert_from_path
 from PIL import Image, ImageOps
-import pytesseract
 import string
+from services.page_precheck import TEXT, classify_page, new_class_counts
+from services.tesseract_batch import image_to_string, image_to_data, image_to_string_batch
 
 
 class IMG2Txt:
-    def __init__(self):
+    def __init__(self, cache=None, single_pass=False, min_confidence=60, batch_ocr=True, precheck=False):
+        """
+        `single_pass=True` builds each paragraph's text from the words of the first
+        `image_to_data` call and only re-OCRs the crop of paragraphs whose mean word
+        confidence is below `min_confidence` (0-100). The default re-OCRs every paragraph.
+        With `batch_ocr=True` the paragraph crops of a page are re-OCRed by one tesseract
+        process instead of one process per crop. With `precheck=True` blank and picture
+        pages (services.page_precheck) are not OCRed; `page_classes` counts the pages
+        scanned per class.
+        """
         self.custom_config = r'--psm 3 --oem 3'
         self.blocks = None
         self.image = None
-
-    def scan_image(self, img):
+        self.cache = cache
+        self.single_pass = single_pass
+        self.min_confidence = min_confidence
+        self.batch_ocr = batch_ocr
+        self.precheck = precheck
+        self.page_classes = new_class_counts()
+        self.reocr_blocks = 0
+
+    def scan_image(self, img, dpi=None):
         self.texts = []
         self.image = ImageOps.grayscale(img)
-        info_text = pytesseract.image_to_data(self.image, config=self.custom_config, lang="vie",
-                                              output_type=pytesseract.Output.DICT)
+        self.blocks = None
+        self.reocr_blocks = 0
+        if self.precheck:
+            page_class = classify_page(self.image)
+            self.page_classes[page_class] += 1
+            if page_class != TEXT:
+                return None
+        if self.cache is None:
+            return self._scan_image()
+
+        # Kết quả được lưu theo nội dung trang, kể cả trang không có chữ (lưu chuỗi rỗng)
+        # raw_words: khoá mới cho kết quả single_pass ghép từ mọi từ của Tesseract (không dùng lại kết quả cũ)
+        mode = f"single_pass={self.min_confidence} raw_words " if self.single_pass else ""
+        key = self.cache.make_key(self.image, dpi, "vie", "IMG2Txt " + mode + self.custom_config)
+        output = self.cache.get(key)
+        if output is None:
+            output = self._scan_image() or ""
+            self.cache.put(key, output)
+        return output or None
+
+    def _scan_image(self):
+        info_text = image_to_data(self.image, config=self.custom_config, lang="vie")
         high_image = self.image.height
         data = []
+        # Mọi từ Tesseract đọc được (kể cả từ chỉ có chữ ngoài ASCII) dùng để ghép chữ ở chế độ single_pass;
+        # bộ lọc pre_clean_word_image chỉ dùng cho phần bố cục
+        words = []
 
         for i in range(len(info_text['text'])):
             point_data = {}
+            raw_text = str(info_text['text'][i]).strip()
+            if raw_text and raw_text != "nan":
+                words.append({
+                    "box": (info_text['left'][i], info_text['top'][i],
+                            info_text['left'][i] + info_text['width'][i], info_text['top'][i] + info_text['height'][i]),
+                    "line": (info_text['block_num'][i], info_text['par_num'][i], info_text['line_num'][i]),
+                    "text": raw_text,
+                    "conf": float(info_text['conf'][i])
+                })
             if self.pre_clean_word_image(str(info_text['text'][i])):
                 point_data["top"] = [info_text['left'][i], high_image - info_text['top'][i]]
                 point_data["bot"] = [info_text['left'][i] + info_text['width'][i],
@@ -28,8 +78,82 @@ class IMG2Txt:
                 point_data["height"] = info_text['height'][i]
                 point_data["text"] = info_text['text'][i]
                 point_data["len"] = len(point_data["text"])
+                point_data["confs"] = [float(info_text['conf'][i])]
                 data.append(point_data)
 
+        blocks = self.group_words(data)
+        if self.single_pass:
+            blocks = self.assign_words(blocks, words, high_image)
+
+        reocr = [not (self.single_pass and self.block_confidence(block) >= self.min_confidence)
+                 for block in blocks]
+        crops = [self.image.crop((block["top"][0] - 5, high_image - block["top"][1] - 5, block["bot"][0] + 5,
+                                  high_image - block["bot"][1] + 5))
+                 for block, needs_ocr in zip(blocks, reocr) if needs_ocr]
+        self.reocr_blocks = len(crops)
+        if self.batch_ocr:
+            crop_texts = iter(image_to_string_batch(crops, lang="vie", config=self.custom_config))
+        else:
+            crop_texts = (image_to_string(img1, lang="vie", config=self.custom_config) for img1 in crops)
+
+        for block, needs_ocr in zip(blocks, reocr):
+            if not needs_ocr:
+                # Dùng lại các từ của lần image_to_data đầu tiên, không OCR lại vùng này
+                self.texts.extend([self.clean_text_blocks(line) for line in block["lines"] if line.strip()])
+                continue
+
+            text_blocks = next(crop_texts)
+            self.texts.extend([self.clean_text_blocks(line) for line in text_blocks.split("\n") if line.strip()])
+
+        self.blocks = blocks
+
+        if not self.texts:
+            return None
+
+        output = self._construct_output()
+        return output
+
+    def assign_words(self, blocks: list, words: list, high_image: int) -> list:
+        """
+        Give every raw word of `image_to_data` to a paragraph block, for single-pass text.
+
+        A word goes to the block containing its centre, or else to the nearest block; when
+        there is no block at all, the words form blocks of their own (one per Tesseract
+        paragraph). Each block gets `lines` (the words joined per Tesseract line, in reading
+        order, duplicates kept) and `confs` (the confidences of its words).
+        """
+        if not words:
+            return blocks
+        if not blocks:
+            blocks = []
+            for word in words:
+                if not blocks or blocks[-1]["key"] != word["line"][:2]:
+                    blocks.append({"key": word["line"][:2], "top": [word["box"][0], high_image - word["box"][1]],
+                                   "bot": [word["box"][2], high_image - word["box"][3]]})
+                block = blocks[-1]
+                block["top"] = [min(block["top"][0], word["box"][0]), max(block["top"][1], high_image - word["box"][1])]
+                block["bot"] = [max(block["bot"][0], word["box"][2]), min(block["bot"][1], high_image - word["box"][3])]
+
+        # Hộp của block theo toạ độ ảnh: [x trái, y trên, x phải, y dưới]
+        rects = np.array([[block["top"][0], high_image - block["top"][1], block["bot"][0], high_image - block["bot"][1]]
+                          for block in blocks], dtype=float)
+        block_words = [[] for _ in blocks]
+        for word in words:
+            x, y = (word["box"][0] + word["box"][2]) / 2, (word["box"][1] + word["box"][3]) / 2
+            dx = np.maximum(np.maximum(rects[:, 0] - x, x - rects[:, 2]), 0)
+            dy = np.maximum(np.maximum(rects[:, 1] - y, y - rects[:, 3]), 0)
+            block_words[int(np.argmin(np.hypot(dx, dy)))].append(word)
+
+        for block, assigned in zip(blocks, block_words):
+            lines = {}
+            for word in assigned:
+                lines.setdefault(word["line"], []).append(word["text"])
+            block["lines"] = [" ".join(line_words) for line_words in lines.values()]
+            block["confs"] = [word["conf"] for word in assigned]
+        return blocks
+
+    def group_words(self, data: list) -> list:
+        """Group word boxes into lines, blocks and finally paragraph blocks."""
         for _ in range(5):
             c1 = data
             data = self.merge_words_line(c1)
@@ -43,175 +167,201 @@ class IMG2Txt:
             blocks = self.merge_blocks_para(blocks)
             if len(c2) == len(blocks):
                 break
+        return blocks
 
-        for block in blocks:
-            img1 = self.image.crop((block["top"][0] - 5, high_image - block["top"][1] - 5, block["bot"][0] + 5,
-                                    high_image - block["bot"][1] + 5))
-            text_blocks = pytesseract.image_to_string(img1, lang="vie", config=self.custom_config)
-            self.texts.extend([self.clean_text_blocks(line) for line in text_blocks.split("\n") if line.strip()])
+    @staticmethod
+    def block_confidence(block: dict) -> float:
+        # Tesseract trả về conf = -1 cho các phần tử không phải là từ
+        confs = [conf for conf in block.get("confs", []) if conf >= 0]
+        return sum(confs) / len(confs) if confs else 0.0
 
-        self.blocks = blocks
+    # Cột của mảng hộp chữ: mỗi từ/dòng/block là một hàng [x trái, y trên, x phải, y dưới, chiều cao]
+    X0, YTOP, X1, YBOT, HEIGHT = range(5)
 
-        if not self.texts:
-            return None
-
-        output = self._construct_output()
-        return output
+    @staticmethod
+    def boxes_array(items: list) -> np.ndarray:
+        """Stack the `top`/`bot`/`height` fields of word, line or block dicts into an (n, 5) int array."""
+        boxes = np.empty((len(items), 5), dtype=np.int64)
+        for row, item in enumerate(items):
+            boxes[row] = (item["top"][0], item["top"][1], item["bot"][0], item["bot"][1], item.get("height") or 0)
+        return boxes
 
     def merge_blocks_para(self, list_blocks: list) -> list:
         unique_paras = []
         list_inter_blocks = []
-        dict_blocks_copy = [block["text"] for block in list_blocks]
+        # Các block được đánh dấu theo chỉ số, không theo nội dung chữ (hai block có thể trùng chữ)
+        merged = np.zeros(len(list_blocks), dtype=bool)
+        boxes = self.boxes_array(list_blocks)
+        grid = self._build_block_grid(boxes)
 
         for i, block in enumerate(list_blocks):
-            if block["text"] in dict_blocks_copy:
-                group_inter = [block]
-                next_dict_block = list_blocks[i + 1:]
-
-                for j, next_block in enumerate(next_dict_block):
-                    if self.check_merge_blocks(block, next_block):
-                        group_inter.append(next_block)
-                        if next_block["text"] in dict_blocks_copy:
-                            dict_blocks_copy.remove(next_block["text"])
-
-                list_inter_blocks.append(group_inter)
+            if merged[i]:
+                continue
+            group_inter = [block]
+            candidates = self._grid_candidates(grid, boxes[i], i)
+            for j in candidates[self.merge_blocks_mask(boxes[i], boxes[candidates])]:
+                group_inter.append(list_blocks[j])
+                merged[j] = True
+            list_inter_blocks.append(group_inter)
 
         for inter_block in list_inter_blocks:
-            para = {"top": [10000, 0], "bot": [0, 10000], "lines": []}
+            para = {"top": [10000, 0], "bot": [0, 10000], "lines": [], "confs": []}
             for block in inter_block:
                 para["top"] = [min(block["top"][0], para["top"][0]), max(block["top"][1], para["top"][1])]
                 para["bot"] = [max(block["bot"][0], para["bot"][0]), min(block["bot"][1], para["bot"][1])]
                 para["text"] = inter_block[0]["text"]
-                para["lines"] += [line for line in block["lines"] if line not in para["lines"]]
+                para["lines"] += block["lines"]
+                para["confs"] += block.get("confs", [])
             unique_paras.append(para)
 
         return unique_paras
 
+    GRID_CELL = 128
+
+    @classmethod
+    def _block_cells(cls, box: np.ndarray):
+        # Các ô lưới phủ vùng mở rộng (-2 px) mà merge_blocks_mask dùng để xét giao nhau
+        for cx in range((int(box[cls.X0]) - 2) // cls.GRID_CELL, int(box[cls.X1]) // cls.GRID_CELL + 1):
+            for cy in range((int(box[cls.YBOT]) - 2) // cls.GRID_CELL, int(box[cls.YTOP]) // cls.GRID_CELL + 1):
+                yield cx, cy
+
+    def _build_block_grid(self, boxes: np.ndarray) -> dict:
+        grid = {}
+        for idx, box in enumerate(boxes):
+            for cell in self._block_cells(box):
+                grid.setdefault(cell, []).append(idx)
+        return grid
+
+    def _grid_candidates(self, grid: dict, box: np.ndarray, idx: int) -> np.ndarray:
+        """Indices after `idx` of blocks sharing a grid cell with `box`, in list order."""
+        candidates = set()
+        for cell in self._block_cells(box):
+            candidates.update(j for j in grid.get(cell, ()) if j > idx)
+        return np.array(sorted(candidates), dtype=np.int64)
+
+    @classmethod
+    def merge_blocks_mask(cls, box: np.ndarray, others: np.ndarray) -> np.ndarray:
+        """
+        Whether `box` overlaps each row of `others`, with every rectangle grown by 2 px
+        to the left and bottom. Pixel ranges are inclusive: x in [x0 - 2, x1], y in [y_bot - 2, y_top].
+        """
+        x_lo = np.maximum(box[cls.X0], others[:, cls.X0]) - 2
+        x_hi = np.minimum(box[cls.X1], others[:, cls.X1])
+        y_lo = np.maximum(box[cls.YBOT], others[:, cls.YBOT]) - 2
+        y_hi = np.minimum(box[cls.YTOP], others[:, cls.YTOP])
+        non_empty = ((box[cls.X0] - 2 <= box[cls.X1]) & (box[cls.YBOT] - 2 <= box[cls.YTOP])
+                     & (others[:, cls.X0] - 2 <= others[:, cls.X1]) & (others[:, cls.YBOT] - 2 <= others[:, cls.YTOP]))
+        return non_empty & (x_lo <= x_hi) & (y_lo <= y_hi)
+
+    # Khoảng cách dọc tối đa giữa hai dòng trong một block
+    MAX_LINE_GAP = 20
+
     def merge_lines_block(self, list_lines: list) -> list:
         text_blocks = []
-        dict_lines_copy = [line["text"] for line in list_lines]
+        boxes = self.boxes_array(list_lines)
+        merged = np.zeros(len(list_lines), dtype=bool)
+        # Dòng chỉ có ký tự ngoài ASCII không được dùng làm dòng phía trên khi ghép
+        text_ok = np.array([self.pre_clean_word_image(line["text"]) != "" for line in list_lines], dtype=bool)
+        max_gap = np.minimum(boxes[:, self.HEIGHT], self.MAX_LINE_GAP)
+        # Chỉ mục các dòng theo toạ độ y của cạnh trên để chỉ xét những dòng đủ gần đáy block
+        y_order = np.argsort(boxes[:, self.YTOP], kind="stable")
+        y_tops = boxes[y_order, self.YTOP]
 
         for i, line in enumerate(list_lines):
-            if line["text"] in dict_lines_copy:
-                block = {
-                    "top": line.get("top", ""),
-                    "bot": line.get("bot", ""),
-                    "height": line.get("height", ""),
-                    "text": line.get("text", ""),
-                    "lines": [line.get("text", "")]
-                }
-
-                next_dict_lines = list_lines[i + 1:]
-                for j, next_line in enumerate(next_dict_lines):
-                    if j == 0:
-                        bol_check = self.check_merge_lines(block, line, next_line)
-                    else:
-                        bol_check = self.check_merge_lines(block, next_dict_lines[j - 1], next_line)
-
-                    if bol_check:
-                        block["top"] = [min(next_line["top"][0], block["top"][0]),
-                                        max(next_line["top"][1], block["top"][1])]
-                        block["bot"] = [max(next_line["bot"][0], block["bot"][0]),
-                                        min(next_line["bot"][1], block["bot"][1])]
-                        block["height"] = block["top"][1] - next_line["bot"][1]
-                        block["text"] += " " + next_line["text"]
-                        block["lines"].append(next_line["text"])
-
-                        if next_line["text"] in dict_lines_copy:
-                            dict_lines_copy.remove(next_line["text"])
-
-                text_blocks.append(block)
-
-        return text_blocks
-
-    def merge_words_line(self, list_words: list) -> list:
-        bol_next_word = False
-        n_next = 0
-        lines = []
-
-        for i, point in enumerate(list_words):
-            if bol_next_word:
-                if n_next > 0:
-                    n_next -= 1
-                    continue
-
-            bol_next_word = False
-            line = {
-                "top": point.get("top", ""),
-                "bot": point.get("bot", ""),
-                "height": point.get("height", ""),
-                "text": point.get("text", "")
+            if merged[i]:
+                continue
+            block = {
+                "top": line.get("top", ""),
+                "bot": line.get("bot", ""),
+                "height": line.get("height", ""),
+                "text": line.get("text", ""),
+                "lines": [line.get("text", "")],
+                "confs": list(line.get("confs", []))
             }
 
-            next_dict_words = list_words[i + 1:]
-            for j, next_point in enumerate(next_dict_words):
-                if j == 0:
-                    bol_check = self.check_merge_words(line, next_point)
-                else:
-                    bol_check = self.check_merge_words(next_dict_words[j - 1], next_point)
-
-                if bol_check:
-                    line["top"] = [min(next_point["top"][0], line["top"][0]), max(next_point["top"][1], line["top"][1])]
-                    line["bot"] = [max(next_point["bot"][0], line["bot"][0]), min(next_point["bot"][1], line["bot"][1])]
-                    line["height"] = max(line.get("height", ""), next_point.get("height", ""))
-                    line["text"] += " " + next_point["text"]
-                    n_next += 1
-                    bol_next_word = True
-                else:
+            j = i
+            while True:
+                lo = np.searchsorted(y_tops, block["bot"][1] - self.MAX_LINE_GAP, side="right")
+                hi = np.searchsorted(y_tops, block["bot"][1] + self.MAX_LINE_GAP, side="left")
+                candidates = np.sort(y_order[lo:hi][y_order[lo:hi] > j])
+                if not candidates.size:
                     break
+                # Dòng phía trên của mỗi ứng viên là dòng đứng ngay trước nó trong danh sách
+                accepted = candidates[self.merge_lines_mask(block, boxes[candidates],
+                                                            max_gap[candidates - 1], text_ok[candidates - 1])]
+                if not accepted.size:
+                    break
+                j = int(accepted[0])
+                next_line = list_lines[j]
+                block["top"] = [min(next_line["top"][0], block["top"][0]),
+                                max(next_line["top"][1], block["top"][1])]
+                block["bot"] = [max(next_line["bot"][0], block["bot"][0]),
+                                min(next_line["bot"][1], block["bot"][1])]
+                block["height"] = block["top"][1] - next_line["bot"][1]
+                block["text"] += " " + next_line["text"]
+                block["lines"].append(next_line["text"])
+                block["confs"] += next_line.get("confs", [])
+                merged[j] = True
+
+            text_blocks.append(block)
 
-            lines.append(line)
-
-        return lines
-
-    def check_merge_words(self, word1: dict, word2: dict) -> bool:
-        if word2["text"] == "-":
-            return abs(word2["top"][0] - word1["bot"][0]) < max(word1["height"], word2["height"])
-        elif word1["text"] == "-":
-            return True
-        else:
-            bol1 = abs(word2["top"][0] - word1["bot"][0]) < max(word1["height"], word2["height"])
-            bol2 = abs(word2["bot"][1] - word1["bot"][1]) < min(word1["height"], word2["height"]) * 0.5
-        return bol1 and bol2
-
-    def check_merge_lines(self, block: dict, line1: dict, line2: dict) -> bool:
-        range_line_1 = list(range(line1["top"][0], line1["bot"][0]))
-        range_line_2 = list(range(line2["top"][0], line2["bot"][0]))
-        range_block = list(range(block["top"][0], block["bot"][0]))
-
-        if line1["height"] > 20:
-            MAX_SPACE_2LINE = 20
-        else:
-            MAX_SPACE_2LINE = line1["height"]
-
-        if self.pre_clean_word_image(line1["text"]) == "":
-            return False
-
-        bol1 = abs(line1["bot"][1] - line2["top"][1]) < MAX_SPACE_2LINE
-        bol2 = abs(block["bot"][1] - line2["top"][1]) < MAX_SPACE_2LINE
-        bol3 = line1["text"] in block["text"]
+        return text_blocks
 
-        if len(range_block) > len(range_line_2):
-            bol4 = range_line_2[len(range_line_2) // 2] in range_block
-        else:
-            bol4 = range_block[len(range_block) // 2] in range_line_2
+    @classmethod
+    def merge_lines_mask(cls, block: dict, lines: np.ndarray, max_gap: np.ndarray, text_ok: np.ndarray) -> np.ndarray:
+        """
+        Whether each row of `lines` continues `block`: its top edge is closer than `max_gap`
+        (the height of the line above it, at most MAX_LINE_GAP) to the bottom of the block, and
+        the horizontal midpoint of the narrower of line and block lies inside the wider one.
+        """
+        block_x0, block_x1 = block["top"][0], block["bot"][0]
+        block_len = max(block_x1 - block_x0, 0)
+        line_len = np.maximum(lines[:, cls.X1] - lines[:, cls.X0], 0)
+        line_mid = lines[:, cls.X0] + line_len // 2
+        block_mid = block_x0 + block_len // 2
+        mid_inside = np.where(block_len > line_len,
+                              (block_x0 <= line_mid) & (line_mid < block_x1),
+                              (lines[:, cls.X0] <= block_mid) & (block_mid < lines[:, cls.X1]))
+        close = np.abs(block["bot"][1] - lines[:, cls.YTOP]) < max_gap
+        return text_ok & close & mid_inside
 
-        bol5 = abs(block["bot"][1] - line2["top"][1]) < MAX_SPACE_2LINE
-        if len(range_block) > len(range_line_2):
-            bol6 = range_line_2[len(range_line_2) // 2] in range_block
-        else:
-            bol6 = range_block[len(range_block) // 2] in range_line_2
+    def merge_words_line(self, list_words: list) -> list:
+        if not list_words:
+            return []
+        boxes = self.boxes_array(list_words)
+        texts = [word["text"] for word in list_words]
+
+        # Một dòng là một dãy liên tiếp các từ mà mọi cặp kề nhau đều ghép được
+        starts = np.flatnonzero(np.concatenate(([True], ~self.merge_words_mask(boxes, texts))))
+        x0 = np.minimum.reduceat(boxes[:, self.X0], starts).tolist()
+        y_top = np.maximum.reduceat(boxes[:, self.YTOP], starts).tolist()
+        x1 = np.maximum.reduceat(boxes[:, self.X1], starts).tolist()
+        y_bot = np.minimum.reduceat(boxes[:, self.YBOT], starts).tolist()
+        height = np.maximum.reduceat(boxes[:, self.HEIGHT], starts).tolist()
+        ends = starts.tolist()[1:] + [len(list_words)]
 
-        return (bol1 and bol2 and bol3 and bol4) or (bol5 and bol6)
+        lines = []
+        for k, (start, end) in enumerate(zip(starts.tolist(), ends)):
+            lines.append({
+                "top": [x0[k], y_top[k]],
+                "bot": [x1[k], y_bot[k]],
+                "height": height[k],
+                "text": " ".join(texts[start:end]),
+                "confs": [conf for word in list_words[start:end] for conf in word.get("confs", [])]
+            })
 
-    def check_merge_blocks(self, block1: dict, block2: dict) -> bool:
-        func_inter_2rect = lambda list1, list2: True if set(list1).intersection(list2) else False
-        range_x_block1 = range(block1["top"][0] - 2, block1["bot"][0] + 1)
-        range_y_block1 = range(block1["bot"][1] - 2, block1["top"][1] + 1)
-        range_x_block2 = range(block2["top"][0] - 2, block2["bot"][0] + 1)
-        range_y_block2 = range(block2["bot"][1] - 2, block2["top"][1] + 1)
+        return lines
 
-        return func_inter_2rect(range_x_block1, range_x_block2) and func_inter_2rect(range_y_block1, range_y_block2)
+    @classmethod
+    def merge_words_mask(cls, boxes: np.ndarray, texts: list) -> np.ndarray:
+        """Whether word k + 1 continues the line of word k, for every consecutive pair of rows in `boxes`."""
+        is_dash = np.array([text == "-" for text in texts], dtype=bool)
+        prev, curr = boxes[:-1], boxes[1:]
+        close_x = np.abs(curr[:, cls.X0] - prev[:, cls.X1]) < np.maximum(prev[:, cls.HEIGHT], curr[:, cls.HEIGHT])
+        same_row = np.abs(curr[:, cls.YBOT] - prev[:, cls.YBOT]) < np.minimum(prev[:, cls.HEIGHT],
+                                                                              curr[:, cls.HEIGHT]) * 0.5
+        # Sau dấu "-" luôn ghép, trước dấu "-" chỉ cần gần theo chiều ngang
+        return np.where(is_dash[1:], close_x, is_dash[:-1] | (close_x & same_row))
 
     def pre_clean_word_image(self, text: str) -> str:
         if text == "nan" or len(text) > 20:
@@ -248,17 +398,17 @@ class IMG2Txt:
         return output
 
 
-def pdf_to_images(pdf_path):
-    images = convert_from_path(pdf_path)
+def pdf_to_images(pdf_path, dpi=200):
+    images = convert_from_path(pdf_path, dpi=dpi)
     return images
 
 
-def convert_images_to_text(images):
-    img2txt = IMG2Txt()
+def convert_images_to_text(images, cache=None, dpi=None, precheck=False):
+    img2txt = IMG2Txt(cache=cache, precheck=precheck)
     texts = []
 
     for img in images:
-        text = img2txt.scan_image(img)
+        text = img2txt.scan_image(img, dpi=dpi)
         if text:
             texts.append(text)
 